@@ -0,0 +1,74 @@
+"""add daily rollups
+
+Revision ID: 5a7c9d3b1e82
+Revises: c81d5e2f4a19
+Create Date: 2026-10-17 11:40:05.912734
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '5a7c9d3b1e82'
+down_revision: Union[str, None] = 'c81d5e2f4a19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'daily_rollups',
+        sa.Column('chat_id', sa.BigInteger(), nullable=False),
+        sa.Column('local_date', sa.Date(), nullable=False),
+        sa.Column('day_feed_ml', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('night_feed_ml', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('day_sleep_min', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('night_sleep_min', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('feed_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('sleep_count', sa.Integer(), server_default='0', nullable=False),
+        sa.ForeignKeyConstraint(['chat_id'], ['users.chat_id']),
+        sa.PrimaryKeyConstraint('chat_id', 'local_date'),
+    )
+
+    # Заполняем итоги по уже существующим записям (см. db/rollups.py)
+    op.execute("""
+        INSERT INTO daily_rollups (chat_id, local_date, day_feed_ml, night_feed_ml, feed_count)
+        SELECT chat_id,
+               (timestamp AT TIME ZONE 'Europe/Moscow')::date AS local_date,
+               sum(CASE WHEN (timestamp AT TIME ZONE 'Europe/Moscow')::time
+                             BETWEEN '06:00' AND '22:00' THEN amount ELSE 0 END),
+               sum(CASE WHEN (timestamp AT TIME ZONE 'Europe/Moscow')::time
+                             BETWEEN '06:00' AND '22:00' THEN 0 ELSE amount END),
+               count(*)
+        FROM feeding_records
+        WHERE timestamp IS NOT NULL
+        GROUP BY chat_id, local_date
+    """)
+    op.execute("""
+        INSERT INTO daily_rollups (chat_id, local_date, day_sleep_min, night_sleep_min, sleep_count)
+        SELECT chat_id,
+               (end_time AT TIME ZONE 'Europe/Moscow')::date AS local_date,
+               sum(CASE WHEN (end_time AT TIME ZONE 'Europe/Moscow')::time
+                             BETWEEN '06:00' AND '22:00'
+                        THEN floor(extract(epoch FROM end_time - start_time) / 60) ELSE 0 END),
+               sum(CASE WHEN (end_time AT TIME ZONE 'Europe/Moscow')::time
+                             BETWEEN '06:00' AND '22:00'
+                        THEN 0 ELSE floor(extract(epoch FROM end_time - start_time) / 60) END),
+               count(*)
+        FROM sleep_records
+        WHERE end_time IS NOT NULL
+        GROUP BY chat_id, local_date
+        ON CONFLICT (chat_id, local_date) DO UPDATE
+        SET day_sleep_min = EXCLUDED.day_sleep_min,
+            night_sleep_min = EXCLUDED.night_sleep_min,
+            sleep_count = EXCLUDED.sleep_count
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('daily_rollups')
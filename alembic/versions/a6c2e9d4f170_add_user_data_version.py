@@ -0,0 +1,32 @@
+"""add user data version
+
+Revision ID: a6c2e9d4f170
+Revises: f3b8d1a7c052
+Create Date: 2026-10-17 19:40:12.603381
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6c2e9d4f170'
+down_revision: Union[str, None] = 'f3b8d1a7c052'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Версия данных для кэша диаграмм, общая для всех экземпляров бота
+    op.add_column(
+        'users',
+        sa.Column('data_version', sa.Integer(), server_default='0', nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'data_version')
@@ -0,0 +1,41 @@
+"""add bot state
+
+Revision ID: b4e1f07c2d63
+Revises: 5a7c9d3b1e82
+Create Date: 2026-10-17 14:02:27.518340
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4e1f07c2d63'
+down_revision: Union[str, None] = '5a7c9d3b1e82'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'bot_state',
+        sa.Column('bot_id', sa.BigInteger(), nullable=False),
+        sa.Column('chat_id', sa.BigInteger(), nullable=False),
+        sa.Column('user_id', sa.BigInteger(), nullable=False),
+        sa.Column('destiny', sa.String(length=32), nullable=False),
+        sa.Column('state', sa.String(), nullable=True),
+        sa.Column('data', postgresql.JSONB(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('bot_id', 'chat_id', 'user_id', 'destiny'),
+    )
+    op.create_index('ix_bot_state_expires_at', 'bot_state', ['expires_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_bot_state_expires_at', table_name='bot_state')
+    op.drop_table('bot_state')
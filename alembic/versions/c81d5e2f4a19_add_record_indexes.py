@@ -0,0 +1,47 @@
+"""add record indexes
+
+Revision ID: c81d5e2f4a19
+Revises: 9e0100b68a2b
+Create Date: 2026-10-17 10:12:41.305118
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'c81d5e2f4a19'
+down_revision: Union[str, None] = '9e0100b68a2b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Все горячие запросы фильтруют по chat_id и времени записи
+    op.create_index(
+        'ix_feeding_records_chat_id_timestamp',
+        'feeding_records',
+        ['chat_id', 'timestamp'],
+    )
+    op.create_index(
+        'ix_sleep_records_chat_id_end_time',
+        'sleep_records',
+        ['chat_id', 'end_time'],
+    )
+    # Частичный индекс для поиска активного сна (end_time IS NULL)
+    op.create_index(
+        'ix_sleep_records_active',
+        'sleep_records',
+        ['chat_id', 'start_time'],
+        postgresql_where=sa.text('end_time IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_sleep_records_active', table_name='sleep_records')
+    op.drop_index('ix_sleep_records_chat_id_end_time', table_name='sleep_records')
+    op.drop_index('ix_feeding_records_chat_id_timestamp', table_name='feeding_records')
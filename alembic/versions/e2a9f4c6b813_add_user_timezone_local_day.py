@@ -0,0 +1,114 @@
+"""add user timezone and local day
+
+Revision ID: e2a9f4c6b813
+Revises: b4e1f07c2d63
+Create Date: 2026-10-17 18:21:09.447102
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a9f4c6b813'
+down_revision: Union[str, None] = 'b4e1f07c2d63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'users',
+        sa.Column('timezone', sa.String(), server_default='Europe/Moscow', nullable=False),
+    )
+    op.add_column('feeding_records', sa.Column('local_day', sa.Date(), nullable=True))
+    op.add_column('sleep_records', sa.Column('local_day', sa.Date(), nullable=True))
+
+    # Местная дата зависит от часового пояса из другой таблицы, поэтому
+    # generated column не подходит — колонку заполняют триггеры
+    op.execute("""
+        CREATE FUNCTION feeding_records_local_day() RETURNS trigger AS $$
+        BEGIN
+            NEW.local_day := (NEW.timestamp AT TIME ZONE coalesce(
+                (SELECT timezone FROM users WHERE chat_id = NEW.chat_id), 'Europe/Moscow'))::date;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER feeding_records_local_day
+        BEFORE INSERT OR UPDATE OF chat_id, timestamp ON feeding_records
+        FOR EACH ROW EXECUTE FUNCTION feeding_records_local_day()
+    """)
+    # Сон относится к дню своего окончания; у незавершённого сна даты нет
+    op.execute("""
+        CREATE FUNCTION sleep_records_local_day() RETURNS trigger AS $$
+        BEGIN
+            NEW.local_day := (NEW.end_time AT TIME ZONE coalesce(
+                (SELECT timezone FROM users WHERE chat_id = NEW.chat_id), 'Europe/Moscow'))::date;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER sleep_records_local_day
+        BEFORE INSERT OR UPDATE OF chat_id, end_time ON sleep_records
+        FOR EACH ROW EXECUTE FUNCTION sleep_records_local_day()
+    """)
+    # Смена часового пояса пересчитывает даты всех записей пользователя
+    op.execute("""
+        CREATE FUNCTION users_timezone_changed() RETURNS trigger AS $$
+        BEGIN
+            UPDATE feeding_records
+            SET local_day = (timestamp AT TIME ZONE NEW.timezone)::date
+            WHERE chat_id = NEW.chat_id;
+            UPDATE sleep_records
+            SET local_day = (end_time AT TIME ZONE NEW.timezone)::date
+            WHERE chat_id = NEW.chat_id;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER users_timezone_changed
+        AFTER UPDATE OF timezone ON users
+        FOR EACH ROW WHEN (OLD.timezone IS DISTINCT FROM NEW.timezone)
+        EXECUTE FUNCTION users_timezone_changed()
+    """)
+
+    # Все пользователи пока в часовом поясе по умолчанию
+    op.execute("""
+        UPDATE feeding_records SET local_day = (timestamp AT TIME ZONE 'Europe/Moscow')::date
+    """)
+    op.execute("""
+        UPDATE sleep_records SET local_day = (end_time AT TIME ZONE 'Europe/Moscow')::date
+    """)
+
+    op.create_index(
+        'ix_feeding_records_chat_id_local_day',
+        'feeding_records',
+        ['chat_id', 'local_day'],
+    )
+    op.create_index(
+        'ix_sleep_records_chat_id_local_day',
+        'sleep_records',
+        ['chat_id', 'local_day'],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_sleep_records_chat_id_local_day', table_name='sleep_records')
+    op.drop_index('ix_feeding_records_chat_id_local_day', table_name='feeding_records')
+    op.execute("DROP TRIGGER users_timezone_changed ON users")
+    op.execute("DROP FUNCTION users_timezone_changed()")
+    op.execute("DROP TRIGGER sleep_records_local_day ON sleep_records")
+    op.execute("DROP FUNCTION sleep_records_local_day()")
+    op.execute("DROP TRIGGER feeding_records_local_day ON feeding_records")
+    op.execute("DROP FUNCTION feeding_records_local_day()")
+    op.drop_column('sleep_records', 'local_day')
+    op.drop_column('feeding_records', 'local_day')
+    op.drop_column('users', 'timezone')
@@ -0,0 +1,138 @@
+"""split sleep rollups
+
+Revision ID: f3b8d1a7c052
+Revises: e2a9f4c6b813
+Create Date: 2026-10-17 19:05:44.218306
+
+"""
+from datetime import datetime, time, timedelta, timezone
+from typing import Sequence, Union
+from zoneinfo import ZoneInfo
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b8d1a7c052'
+down_revision: Union[str, None] = 'e2a9f4c6b813'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH = 1000
+
+# Копия правил db/intervals.py на момент миграции: миграция не должна
+# меняться вместе с кодом приложения
+DAY_START = time(6, 0)
+DAY_END = time(22, 0)
+
+UPSERT = sa.text("""
+    INSERT INTO daily_rollups (chat_id, local_date, day_sleep_min, night_sleep_min, sleep_count)
+    VALUES (:chat_id, :local_date, :day_sleep_min, :night_sleep_min, :sleep_count)
+    ON CONFLICT (chat_id, local_date) DO UPDATE
+    SET day_sleep_min = EXCLUDED.day_sleep_min,
+        night_sleep_min = EXCLUDED.night_sleep_min,
+        sleep_count = EXCLUDED.sleep_count
+""")
+
+RESET = sa.text("UPDATE daily_rollups SET day_sleep_min = 0, night_sleep_min = 0, sleep_count = 0")
+
+
+def _split(chat_id: int, zone: str, sleeps: list) -> list:
+    """Итоги сна по дням: сон делится на границах суток и дневного времени, пересечения учитываются один раз."""
+    tz = ZoneInfo(zone)
+    seconds, counts = {}, {}
+    covered = None
+    for start, end in sleeps:
+        end_day = end.astimezone(tz).date()
+        counts[end_day] = counts.get(end_day, 0) + 1
+        if covered is not None:
+            start = max(start, covered)
+        covered = end if covered is None else max(covered, end)
+
+        position = start
+        while position < end:
+            day = position.astimezone(tz).date()
+            midnight, day_start, day_end, next_midnight = (
+                datetime.combine(bound_day, bound, tz).astimezone(timezone.utc)
+                for bound_day, bound in (
+                    (day, time.min),
+                    (day, DAY_START),
+                    (day, DAY_END),
+                    (day + timedelta(days=1), time.min),
+                )
+            )
+            totals = seconds.setdefault(day, [0.0, 0.0])
+            for low, high, slot in (
+                (midnight, day_start, 1),
+                (day_start, day_end, 0),
+                (day_end, next_midnight, 1),
+            ):
+                low, high = max(position, low), min(end, high)
+                if high > low:
+                    totals[slot] += (high - low).total_seconds()
+            position = next_midnight
+
+    return [
+        {
+            "chat_id": chat_id,
+            "local_date": day,
+            "day_sleep_min": int(seconds.get(day, (0, 0))[0] // 60),
+            "night_sleep_min": int(seconds.get(day, (0, 0))[1] // 60),
+            "sleep_count": counts.get(day, 0),
+        }
+        for day in sorted(seconds.keys() | counts.keys())
+    ]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Раньше сон целиком относился ко дню и интервалу своего окончания;
+    # теперь он делится по дням и дневному/ночному времени
+    connection = op.get_bind()
+    connection.execute(RESET)
+
+    result = connection.execute(sa.text("""
+        SELECT s.chat_id, u.timezone, s.start_time, s.end_time
+        FROM sleep_records s JOIN users u ON u.chat_id = s.chat_id
+        WHERE s.end_time IS NOT NULL
+        ORDER BY s.chat_id, s.start_time
+    """).execution_options(stream_results=True))
+    rows, sleeps = [], []
+    chat_id = zone = None
+    for row_chat_id, row_zone, start_time, end_time in result:
+        if row_chat_id != chat_id:
+            if sleeps:
+                rows.extend(_split(chat_id, zone, sleeps))
+            chat_id, zone, sleeps = row_chat_id, row_zone, []
+        sleeps.append((start_time, end_time))
+    if sleeps:
+        rows.extend(_split(chat_id, zone, sleeps))
+
+    for offset in range(0, len(rows), BATCH):
+        connection.execute(UPSERT, rows[offset:offset + BATCH])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Прежнее распределение: весь сон — в день и интервал окончания
+    op.execute(RESET)
+    op.execute("""
+        INSERT INTO daily_rollups (chat_id, local_date, day_sleep_min, night_sleep_min, sleep_count)
+        SELECT chat_id, local_day,
+               sum(CASE WHEN is_day THEN minutes ELSE 0 END),
+               sum(CASE WHEN is_day THEN 0 ELSE minutes END),
+               count(*)
+        FROM (
+            SELECT s.chat_id, s.local_day,
+                   (s.end_time AT TIME ZONE u.timezone)::time BETWEEN '06:00' AND '22:00' AS is_day,
+                   floor(extract(epoch FROM s.end_time - s.start_time) / 60)::integer AS minutes
+            FROM sleep_records s JOIN users u ON u.chat_id = s.chat_id
+            WHERE s.end_time IS NOT NULL
+        ) AS sleeps
+        GROUP BY chat_id, local_day
+        ON CONFLICT (chat_id, local_date) DO UPDATE
+        SET day_sleep_min = EXCLUDED.day_sleep_min,
+            night_sleep_min = EXCLUDED.night_sleep_min,
+            sleep_count = EXCLUDED.sleep_count
+    """)
@@ -0,0 +1,13 @@
+"""
+Бенчмарки статистики, графиков и ночной рассылки на синтетических данных.
+
+    python -m benchmarks.generator --chats 100 --days 365   # засеять
+    python -m benchmarks.run --output results.json            # измерить
+    python -m benchmarks.compare old.json new.json            # сравнить
+    python -m benchmarks.load --chats 200 --scenario mixed    # нагрузка на dp
+    python -m benchmarks.generator --clean                    # удалить
+
+Синтетические пользователи получают отрицательные chat_id начиная с
+BENCH_CHAT_BASE (benchmarks.load и benchmarks.startup — с LOAD_CHAT_BASE)
+и не пересекаются с настоящими.
+"""
@@ -0,0 +1,33 @@
+"""
+Общие части отчётов бенчмарков: перцентили и коммит.
+
+Только стандартная библиотека — benchmarks.startup импортирует модуль до
+замера фазы import.
+"""
+import statistics as stats
+import subprocess
+from typing import Dict, List
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    samples = sorted(samples)
+
+    def percentile(p: float) -> float:
+        return samples[min(len(samples) - 1, int(round(p * (len(samples) - 1))))]
+
+    return {
+        "runs": len(samples),
+        "min_ms": round(samples[0] * 1000, 3),
+        "p50_ms": round(stats.median(samples) * 1000, 3),
+        "p95_ms": round(percentile(0.95) * 1000, 3),
+        "p99_ms": round(percentile(0.99) * 1000, 3),
+        "max_ms": round(samples[-1] * 1000, 3),
+        "mean_ms": round(stats.fmean(samples) * 1000, 3),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
@@ -0,0 +1,35 @@
+"""
+Сравнение двух отчётов benchmarks.run по медиане.
+
+Запуск: python -m benchmarks.compare old.json new.json [--threshold 1.2]
+Код возврата 1, если хоть один замер замедлился больше чем в threshold раз.
+"""
+import argparse
+import json
+import sys
+
+
+def compare(old: dict, new: dict, threshold: float) -> int:
+    regressions = 0
+    print(f"{'замер':<40} {old['commit']:>10} {new['commit']:>10}   отношение")
+    for name, result in new["results"].items():
+        before = old["results"].get(name)
+        if before is None:
+            print(f"{name:<40} {'—':>10} {result['p50_ms']:>10.1f}")
+            continue
+        ratio = result["p50_ms"] / before["p50_ms"] if before["p50_ms"] else float("inf")
+        mark = " ⚠" if ratio > threshold else ""
+        regressions += ratio > threshold
+        print(f"{name:<40} {before['p50_ms']:>10.1f} {result['p50_ms']:>10.1f}   {ratio:.2f}{mark}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сравнение результатов бенчмарков")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=1.2)
+    args = parser.parse_args()
+
+    with open(args.old, encoding="utf-8") as old, open(args.new, encoding="utf-8") as new:
+        sys.exit(compare(json.load(old), json.load(new), args.threshold))
@@ -0,0 +1,157 @@
+"""
+Генератор правдоподобной истории кормлений и сна.
+
+История детерминирована: одинаковые seed, число чатов и дней дают одни и те
+же записи. Данные загружаются через COPY, затем пересчитываются суточные итоги.
+"""
+import argparse
+import asyncio
+import logging
+import random
+from datetime import datetime, time, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import delete, text
+from sqlalchemy.future import select
+
+from db.database import AsyncSessionLocal, engine
+from db.models import (DEFAULT_TZ, BotState, DailyRollup, FeedingRecord,
+                       SleepRecord, User)
+from db.rollups import rebuild
+
+BENCH_CHAT_BASE = -1_000_000
+# Чаты benchmarks.load и benchmarks.startup: отдельный диапазон
+# (LOAD_CHAT_BASE - LOAD_CHAT_LIMIT, LOAD_CHAT_BASE], чтобы их уборка не
+# удаляла засеянную историю, на которой работает benchmarks.run
+LOAD_CHAT_BASE = -100_000
+LOAD_CHAT_LIMIT = 100_000
+# По сколько чатов загружать и пересчитывать за раз
+SEED_CHUNK = 200
+
+Feeding = Tuple[datetime, int]
+Sleep = Tuple[datetime, datetime]
+
+
+def bench_chat_ids(chats: int, base: int = BENCH_CHAT_BASE) -> List[int]:
+    return [base - i for i in range(chats)]
+
+
+def generate_history(rng: random.Random, days: int, end: datetime) -> Tuple[List[Feeding], List[Sleep]]:
+    """
+    История одного ребёнка за days дней до end (UTC).
+
+    Кормления каждые 2–4 часа, объём растёт с возрастом; ночной сон
+    с 21–23 до 5–7 часов с пробуждениями, днём 2–4 сна по 30–120 минут.
+    """
+    feedings: List[Feeding] = []
+    sleeps: List[Sleep] = []
+    start_day = end.astimezone(DEFAULT_TZ).date() - timedelta(days=days)
+
+    moment = DEFAULT_TZ.localize(datetime.combine(start_day, time(6))).astimezone(timezone.utc)
+    while moment < end:
+        age = (moment.date() - start_day).days
+        base = min(60 + age // 2, 220)
+        feedings.append((moment, max(20, int(rng.gauss(base, base * 0.15)))))
+        moment += timedelta(minutes=rng.randint(120, 240))
+
+    for offset in range(days):
+        day = start_day + timedelta(days=offset)
+        # Дневные сны
+        nap = DEFAULT_TZ.localize(datetime.combine(day, time(8, rng.randint(0, 59))))
+        for _ in range(rng.randint(2, 4)):
+            length = timedelta(minutes=rng.randint(30, 120))
+            sleeps.append((nap, nap + length))
+            nap += length + timedelta(minutes=rng.randint(90, 180))
+        # Ночной сон, прерываемый кормлениями
+        night = DEFAULT_TZ.localize(datetime.combine(day, time(rng.randint(21, 22), rng.randint(0, 59))))
+        morning = DEFAULT_TZ.localize(
+            datetime.combine(day + timedelta(days=1), time(rng.randint(5, 6), rng.randint(0, 59)))
+        )
+        while night < morning:
+            wake = min(morning, night + timedelta(minutes=rng.randint(120, 300)))
+            sleeps.append((night, wake))
+            night = wake + timedelta(minutes=rng.randint(10, 40))
+
+    sleeps = [
+        (start.astimezone(timezone.utc), finish.astimezone(timezone.utc))
+        for start, finish in sleeps
+        if finish <= end
+    ]
+    return feedings, sleeps
+
+
+async def clean(base: int = BENCH_CHAT_BASE, limit: Optional[int] = None) -> None:
+    """Удаляет синтетических пользователей с chat_id из (base - limit, base] и их записи."""
+    async with AsyncSessionLocal() as db:
+        for model in (FeedingRecord, SleepRecord, DailyRollup, BotState, User):
+            condition = model.chat_id <= base
+            if limit is not None:
+                condition &= model.chat_id > base - limit
+            await db.execute(delete(model).where(condition))
+        await db.commit()
+
+
+async def existing_chats() -> List[int]:
+    """Синтетические пользователи, уже лежащие в БД."""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(User.chat_id).where(User.chat_id <= BENCH_CHAT_BASE).order_by(User.chat_id.desc())
+        )
+        return list(result.scalars())
+
+
+async def seed(chats: int, days: int, seed: int = 0) -> List[int]:
+    """Пересоздаёт chats синтетических пользователей с историей за days дней."""
+    await clean()
+    rng = random.Random(seed)
+    end = datetime.now(timezone.utc)
+    chat_ids = bench_chat_ids(chats)
+
+    for offset in range(0, chats, SEED_CHUNK):
+        chunk = chat_ids[offset:offset + SEED_CHUNK]
+        users, feedings, sleeps = [], [], []
+        for chat_id in chunk:
+            chat_feedings, chat_sleeps = generate_history(rng, days, end)
+            users.append((chat_id, f"bench {chat_id}"))
+            feedings.extend((chat_id, amount, moment) for moment, amount in chat_feedings)
+            sleeps.extend((chat_id, start, finish) for start, finish in chat_sleeps)
+
+        async with AsyncSessionLocal() as db:
+            connection = await db.connection()
+            raw = (await connection.get_raw_connection()).driver_connection
+            await raw.copy_records_to_table("users", records=users, columns=("chat_id", "name"))
+            await raw.copy_records_to_table(
+                "feeding_records", records=feedings, columns=("chat_id", "amount", "timestamp")
+            )
+            await raw.copy_records_to_table(
+                "sleep_records", records=sleeps, columns=("chat_id", "start_time", "end_time")
+            )
+            await rebuild(db, chunk)
+            await db.commit()
+        logging.info("Засеяно чатов: %d из %d", offset + len(chunk), chats)
+
+    async with engine.begin() as conn:
+        await conn.execute(text("ANALYZE users, feeding_records, sleep_records, daily_rollups"))
+    return chat_ids
+
+
+async def main(args) -> None:
+    if args.clean:
+        await clean()
+        await clean(LOAD_CHAT_BASE, LOAD_CHAT_LIMIT)
+        logging.info("Синтетические данные удалены")
+    else:
+        await seed(args.chats, args.days, args.seed)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Синтетическая история для бенчмарков")
+    parser.add_argument("--chats", type=int, default=100, help="1 … 10000")
+    parser.add_argument("--days", type=int, default=365, help="7 … 730")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--clean", action="store_true", help="удалить синтетические данные")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(args))
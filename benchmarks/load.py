@@ -0,0 +1,187 @@
+"""
+Нагрузочный прогон настоящего dp из bot_core/bot.py.
+
+Каждый из --chats синтетических чатов проходит сценарий (нажатия кнопок
+и ввод кормлений) --rounds раз; обновления одного чата идут по очереди,
+как их присылает Telegram, разные чаты — параллельно. Бот работает через
+FakeSession: исходящие запросы только считаются, сети нет. В отчёте —
+p50/p95/p99 задержки обработки обновления (всего и по каждому тексту)
+и пропускная способность.
+
+Запуск: python -m benchmarks.load --chats 200 --rounds 3 --scenario mixed
+"""
+import argparse
+import asyncio
+import json
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from itertools import count
+from time import perf_counter
+from typing import Dict, List
+
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import SendPhoto, TelegramMethod
+from aiogram.types import Update
+
+from benchmarks.common import git_commit, summarize
+from benchmarks.generator import (LOAD_CHAT_BASE, LOAD_CHAT_LIMIT,
+                                  bench_chat_ids, clean)
+
+SCENARIOS: Dict[str, List[str]] = {
+    "sleep": ["Сон", "✅ Подтвердить", "Завершить сон"],
+    "feeding": ["Питание", "120", "Питание", "90"],
+    "stats": ["Статистика"],
+    "plots": ["Диаграммы", "🍼 Кормление", "📊 За 7 дней", "😴 Сон", "📊 За 30 дней"],
+}
+SCENARIOS["mixed"] = [text for name in ("sleep", "feeding", "stats", "plots") for text in SCENARIOS[name]]
+
+
+class FakeSession(BaseSession):
+    """Сессия Bot API без сети: считает вызовы и возвращает правдоподобные ответы."""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self._ids = count(1)
+
+    async def make_request(self, bot, method: TelegramMethod, timeout=None):
+        self.calls[type(method).__name__] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if not hasattr(method, "chat_id") or method.__returning__ is bool:
+            return True
+
+        message_id = next(self._ids)
+        message = {
+            "message_id": message_id,
+            "date": int(datetime.now(timezone.utc).timestamp()),
+            "chat": {"id": method.chat_id, "type": "private"},
+            "text": getattr(method, "text", None),
+        }
+        if isinstance(method, SendPhoto):
+            message["photo"] = [
+                {"file_id": f"photo{message_id}", "file_unique_id": f"u{message_id}", "width": 1, "height": 1}
+            ]
+        return method.__returning__.model_validate(message, context={"bot": bot})
+
+    async def close(self) -> None:
+        pass
+
+    async def stream_content(self, *args, **kwargs):
+        yield b""
+
+
+class UpdateFactory:
+    """Синтетические обновления с текстовыми сообщениями."""
+
+    def __init__(self):
+        self._ids = count(1)
+
+    def message(self, chat_id: int, text: str) -> Update:
+        update_id = next(self._ids)
+        return Update.model_validate(
+            {
+                "update_id": update_id,
+                "message": {
+                    "message_id": update_id,
+                    "date": int(datetime.now(timezone.utc).timestamp()),
+                    "chat": {"id": chat_id, "type": "private"},
+                    "from": {"id": chat_id, "is_bot": False, "first_name": "Load"},
+                    "text": text,
+                },
+            }
+        )
+
+
+async def run(chats: int, rounds: int, scenario: str, latency: float) -> dict:
+    from bot_core.bot import dp, on_startup
+    from bot_core.bot_instance import bot
+    from bot_core.render import render_service
+
+    session = FakeSession(latency)
+    bot.session = session
+    await on_startup()
+
+    updates = UpdateFactory()
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    failures = Counter()
+
+    async def feed(chat_id: int, text: str) -> None:
+        started = perf_counter()
+        try:
+            await dp.feed_update(bot, updates.message(chat_id, text))
+        except Exception:
+            failures[text] += 1
+            logging.exception("Ошибка обработки %r", text)
+        latencies[text].append(perf_counter() - started)
+
+    async def chat(chat_id: int) -> None:
+        await feed(chat_id, "/start")
+        for _ in range(rounds):
+            for text in SCENARIOS[scenario]:
+                await feed(chat_id, text)
+
+    started = perf_counter()
+    try:
+        await asyncio.gather(*(chat(chat_id) for chat_id in bench_chat_ids(chats, LOAD_CHAT_BASE)))
+    finally:
+        render_service.shutdown()
+    elapsed = perf_counter() - started
+
+    total = [sample for samples in latencies.values() for sample in samples]
+    return {
+        "updates": len(total),
+        "seconds": round(elapsed, 3),
+        "updates_per_second": round(len(total) / elapsed, 1),
+        "failures": sum(failures.values()),
+        "latency": summarize(total),
+        "by_text": {text: summarize(samples) for text, samples in latencies.items()},
+        "outgoing": dict(session.calls),
+    }
+
+
+async def main(args) -> dict:
+    from db.database import engine
+
+    await clean(LOAD_CHAT_BASE, LOAD_CHAT_LIMIT)
+    try:
+        results = await run(args.chats, args.rounds, args.scenario, args.latency_ms / 1000)
+    finally:
+        if not args.keep:
+            await clean(LOAD_CHAT_BASE, LOAD_CHAT_LIMIT)
+        await engine.dispose()
+    return {
+        "commit": git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "chats": args.chats,
+            "rounds": args.rounds,
+            "scenario": args.scenario,
+            "latency_ms": args.latency_ms,
+        },
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон обработчиков бота")
+    parser.add_argument("--chats", type=int, default=100, help="одновременных чатов")
+    parser.add_argument("--rounds", type=int, default=3, help="повторов сценария в каждом чате")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="задержка ответа Bot API")
+    parser.add_argument("--keep", action="store_true", help="не удалять созданные записи")
+    parser.add_argument("--output", help="файл для JSON (по умолчанию stdout)")
+    args = parser.parse_args()
+    if not 1 <= args.chats <= LOAD_CHAT_LIMIT:
+        parser.error(f"--chats: 1 … {LOAD_CHAT_LIMIT}")
+
+    logging.basicConfig(level=logging.WARNING)
+    report = asyncio.run(main(args))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
@@ -0,0 +1,123 @@
+"""
+Замеры build_statistics_text, generate_*_plot и ночной рассылки.
+
+Каждый замер повторяется --repeat раз (после одного прогрева) на одних и тех
+же синтетических пользователях; результат — JSON с перцентилями в мс,
+коммитом и параметрами данных, чтобы сравнивать прогоны между коммитами.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+from datetime import datetime, timezone
+from time import perf_counter
+from typing import Awaitable, Callable, Dict, List
+from unittest import mock
+
+from benchmarks.common import git_commit, summarize
+from benchmarks.generator import existing_chats, seed
+from db.database import AsyncSessionLocal, engine
+
+
+class StubBot:
+    """Бот без сети: считает отправленные сообщения."""
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send_message(self, **kwargs) -> None:
+        self.sent += 1
+
+
+async def measure(func: Callable[[], Awaitable], repeat: int) -> Dict[str, float]:
+    await func()  # прогрев: пул соединений, процессы отрисовки, кэши планов
+    samples = []
+    for _ in range(repeat):
+        started = perf_counter()
+        await func()
+        samples.append(perf_counter() - started)
+    return summarize(samples)
+
+
+async def _plot(db, chat_id: int, plot_type: str, period: str) -> bytes:
+    """Диаграмма так же, как её строит обработчик: выборка, затем отрисовка."""
+    from bot_core.plots import fetch_plot_data, render_plot
+
+    return await render_plot(plot_type, *await fetch_plot_data(db, chat_id, plot_type, period))
+
+
+def _in_session(func, *args):
+    async def call():
+        async with AsyncSessionLocal() as db:
+            return await func(db, *args)
+    return call
+
+
+async def run(chat_ids: List[int], repeat: int, nightly_repeat: int) -> Dict[str, dict]:
+    from bot_core import statistics
+    from bot_core.render import render_service
+
+    # Самый «тяжёлый» пользователь — первый, у всех одинаковая длина истории
+    chat_id = chat_ids[0]
+    cases = {"build_statistics_text": _in_session(statistics.build_statistics_text, chat_id)}
+    for period in ("7d", "30d", "all"):
+        # Имена замеров прежние, чтобы сравнивать с ранними результатами
+        cases[f"generate_feeding_plot[{period}]"] = _in_session(_plot, chat_id, "feeding", period)
+        cases[f"generate_sleep_plot[{period}]"] = _in_session(_plot, chat_id, "sleep", period)
+
+    results = {}
+    try:
+        for name, func in cases.items():
+            results[name] = await measure(func, repeat)
+            logging.info("%s: p50 %.1f мс", name, results[name]["p50_ms"])
+
+        stub = StubBot()
+        with mock.patch.object(statistics, "bot", stub):
+            results["send_statistics_to_all_users"] = await measure(
+                statistics.send_statistics_to_all_users, nightly_repeat
+            )
+        results["send_statistics_to_all_users"]["messages"] = stub.sent // (nightly_repeat + 1)
+        logging.info("nightly: p50 %.1f мс", results["send_statistics_to_all_users"]["p50_ms"])
+    finally:
+        render_service.shutdown()
+    return results
+
+
+async def main(args) -> dict:
+    if args.chats:
+        chat_ids = await seed(args.chats, args.days, args.seed)
+    else:
+        chat_ids = await existing_chats()
+        if not chat_ids:
+            raise SystemExit("Нет синтетических данных: укажите --chats или запустите benchmarks.generator")
+
+    report = {
+        "commit": git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "data": {"chats": len(chat_ids), "days": args.days if args.chats else None, "seed": args.seed},
+        "results": await run(chat_ids, args.repeat, args.nightly_repeat),
+    }
+    await engine.dispose()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарки статистики и графиков")
+    parser.add_argument("--chats", type=int, default=0, help="пересоздать данные с этим числом чатов")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--nightly-repeat", type=int, default=3)
+    parser.add_argument("--output", help="файл для JSON (по умолчанию stdout)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    report = asyncio.run(main(args))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
@@ -0,0 +1,112 @@
+"""
+Время холодного старта: от запуска процесса до первого обработанного
+обновления и первого графика.
+
+Каждый прогон — отдельный процесс python (импорты не кэшированы в памяти),
+бот работает через FakeSession из benchmarks.load. Фазы:
+import (импорт bot_core.bot), startup (on_startup), first_update
+(/start и «Статистика»), first_plot (первый график, включая подъём
+процессов отрисовки).
+
+Запуск: python -m benchmarks.startup --runs 5 --output startup.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import subprocess
+import sys
+from datetime import datetime, timezone
+from time import perf_counter
+from typing import Dict, List
+
+from benchmarks.common import git_commit, summarize
+
+# Маркер строки с результатом дочернего процесса
+RESULT_PREFIX = "STARTUP "
+
+
+async def _child(launched: float) -> Dict[str, float]:
+    from time import time
+
+    phases = {"interpreter": time() - launched}
+    started = perf_counter()
+
+    from bot_core.bot import dp, on_startup
+    from bot_core.bot_instance import bot
+    phases["import"] = perf_counter() - started
+
+    from benchmarks.generator import LOAD_CHAT_BASE, LOAD_CHAT_LIMIT, clean
+    from benchmarks.load import FakeSession, UpdateFactory
+    from bot_core.render import render_service
+
+    bot.session = FakeSession()
+    updates = UpdateFactory()
+    mark = perf_counter()
+    await on_startup()
+    phases["startup"] = perf_counter() - mark
+
+    try:
+        mark = perf_counter()
+        await dp.feed_update(bot, updates.message(LOAD_CHAT_BASE, "/start"))
+        await dp.feed_update(bot, updates.message(LOAD_CHAT_BASE, "Статистика"))
+        first_update_done = perf_counter()
+        phases["first_update"] = first_update_done - mark
+        phases["to_first_update"] = phases["interpreter"] + first_update_done - started
+
+        mark = perf_counter()
+        for text in ("Диаграммы", "🍼 Кормление", "📊 За 7 дней"):
+            await dp.feed_update(bot, updates.message(LOAD_CHAT_BASE, text))
+        phases["first_plot"] = perf_counter() - mark
+    finally:
+        render_service.shutdown()
+        await clean(LOAD_CHAT_BASE, LOAD_CHAT_LIMIT)
+    return phases
+
+
+def run_once() -> Dict[str, float]:
+    """Запускает один холодный старт в отдельном процессе."""
+    from time import time
+
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--child", repr(time())],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    line = next(line for line in output.splitlines() if line.startswith(RESULT_PREFIX))
+    return json.loads(line[len(RESULT_PREFIX):])
+
+
+def main(runs: int) -> dict:
+    samples: Dict[str, List[float]] = {}
+    for _ in range(runs):
+        for phase, seconds in run_once().items():
+            samples.setdefault(phase, []).append(seconds)
+        logging.info("Прогон: до первого обновления %.2f с", samples["to_first_update"][-1])
+    return {
+        "commit": git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "runs": runs,
+        "results": {phase: summarize(values) for phase, values in samples.items()},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Время холодного старта бота")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="файл для JSON (по умолчанию stdout)")
+    parser.add_argument("--child", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        logging.basicConfig(level=logging.WARNING)
+        print(RESULT_PREFIX + json.dumps(asyncio.run(_child(args.child))))
+        sys.exit(0)
+
+    logging.basicConfig(level=logging.INFO)
+    report = main(args.runs)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
@@ -0,0 +1,61 @@
+"""
+Векторная агрегация по дням для графиков.
+
+Из БД читаются только нужные колонки (дата и сумма за день) в виде
+кортежей, а раскладка по дням периода выполняется NumPy без цикла
+по строкам.
+"""
+from datetime import date, timedelta
+from typing import Iterable, Sequence, Tuple
+
+import numpy as np
+
+
+def day_range(start_date: date, days_count: int) -> np.ndarray:
+    """Даты периода как массив datetime64[D]."""
+    return np.arange(
+        np.datetime64(start_date, "D"), np.datetime64(start_date + timedelta(days=days_count), "D")
+    )
+
+
+def to_columns(rows: Iterable[Tuple[date, int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Строки (дата, значение) → два столбца: datetime64[D] и float64."""
+    rows = list(rows)
+    if not rows:
+        return np.empty(0, dtype="datetime64[D]"), np.empty(0, dtype=np.float64)
+    days, values = zip(*rows)
+    return np.array(days, dtype="datetime64[D]"), np.array(values, dtype=np.float64)
+
+
+def _positions(days: np.ndarray, period: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Номера дней в period и маска дней, попавших в период."""
+    index = np.searchsorted(period, days)
+    inside = (index < len(period)) & (period[np.minimum(index, len(period) - 1)] == days)
+    return index[inside], inside
+
+
+def daily_totals(days: np.ndarray, values: np.ndarray, period: np.ndarray) -> np.ndarray:
+    """
+    Сумма значений по каждому дню period (дни без записей — нули).
+
+    days не обязаны быть уникальными или упорядоченными; значения вне
+    периода отбрасываются.
+    """
+    index, inside = _positions(days, period)
+    return np.bincount(index, weights=values[inside], minlength=len(period))
+
+
+def daily_table(rows: Sequence[tuple], period: np.ndarray, columns: int) -> np.ndarray:
+    """
+    Строки (дата, значение1, ..., значениеN) → массив формы
+    (columns, дни периода) с суммами по дням.
+    """
+    if not rows:
+        return np.zeros((columns, len(period)))
+    days = np.array([row[0] for row in rows], dtype="datetime64[D]")
+    values = np.array([row[1:] for row in rows], dtype=np.float64)
+    index, inside = _positions(days, period)
+    return np.stack([
+        np.bincount(index, weights=column[inside], minlength=len(period))
+        for column in values.T
+    ])
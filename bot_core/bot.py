@@ -2,35 +2,96 @@ import asyncio
 import logging
 import os
 
-import pytz
 from aiogram import Dispatcher
+from aiogram.fsm.storage.memory import MemoryStorage
 
 from bot_core.bot_instance import bot
-from bot_core.handlers import (feeding_router, plots_router, sleep_router,
-                               start_router, stats_router)
+from bot_core.cache import active_sleeps, user_registry
+from bot_core.handlers import (export_router, feeding_router, import_router,
+                               plots_router, sleep_router, start_router,
+                               stats_router, timezone_router)
+from bot_core.metrics import (HandlerMetricsMiddleware,
+                              UpdateMetricsMiddleware, instrument_engine)
+from bot_core.middlewares import DbSessionMiddleware
+from bot_core.plots import PERIOD_START
+from bot_core.profiling import (DEBUG_PROFILE, ProfilingMiddleware,
+                                trace_queries)
+from bot_core.render import render_service
+from bot_core.statistics import schedule_nightly_statistics
+from bot_core.storage import PostgresStorage
+from bot_core.webhook import run_status_server, run_webhook
+from bot_core.workers import run_supervisor
+from db.database import AsyncSessionLocal, engine, warm_pool
 
-dp: Dispatcher = Dispatcher()
+# memory — состояния в памяти процесса (только для одного экземпляра бота)
+FSM_STORAGE = os.getenv("FSM_STORAGE", "postgres")
+storage = PostgresStorage(engine) if FSM_STORAGE == "postgres" else MemoryStorage()
 
-TZ = pytz.timezone("Europe/Moscow")
+dp: Dispatcher = Dispatcher(storage=storage)
 
+# polling — опрос getUpdates, webhook — приём обновлений через FastAPI
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+# Число процессов-обработчиков; 0 или 1 — всё в одном процессе
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", "1"))
+
+
+instrument_engine(engine)
+if DEBUG_PROFILE:
+    trace_queries(engine)
+    dp.update.outer_middleware(ProfilingMiddleware())
+dp.update.outer_middleware(UpdateMetricsMiddleware())
+dp.update.outer_middleware(DbSessionMiddleware(AsyncSessionLocal))
+dp.message.middleware(HandlerMetricsMiddleware())
 
 dp.include_router(sleep_router)
 dp.include_router(start_router)
 dp.include_router(feeding_router)
 dp.include_router(stats_router)
 dp.include_router(plots_router)
+dp.include_router(export_router)
+dp.include_router(import_router)
+dp.include_router(timezone_router)
+
+
+# Ссылки на фоновые задачи, чтобы их не собрал сборщик мусора
+background_tasks = set()
 
 
 async def on_startup() -> None:
     """Функции, выполняемые перед запуском бота."""
+    await warm_pool()
+    async with AsyncSessionLocal() as db:
+        await user_registry.warm(db)
+        await active_sleeps.rebuild(db)
+    if isinstance(storage, PostgresStorage):
+        background_tasks.add(asyncio.create_task(storage.run_cleanup()))
+    # Процессы отрисовки поднимаются в фоне, не задерживая приём обновлений
+    background_tasks.add(asyncio.create_task(render_service.prewarm(PERIOD_START.values())))
     logging.info("Бот запущен и готов к работе!")
 
 
 async def main() -> None:
     """Запуск бота."""
     logging.basicConfig(level=logging.INFO)  # Настроим логирование
+    # Ночная рассылка ставится только в главном процессе; между экземплярами
+    # бота её делит claim_nightly
+    schedule_nightly_statistics()
+    if BOT_WORKERS > 1:
+        # Каждый чат обслуживается одним процессом, поэтому кэши и FSM остаются согласованными
+        await run_supervisor(dp, bot, BOT_WORKERS, BOT_MODE)
+        return
+
     await on_startup()  # Вызываем стартовые функции перед запуском
-    await dp.start_polling(bot)  # Запускаем бота
+    try:
+        if BOT_MODE == "webhook":
+            await run_webhook(dp, bot)
+        else:
+            background_tasks.add(asyncio.create_task(run_status_server()))
+            # Снимаем webhook, если бот раньше работал в этом режиме
+            await bot.delete_webhook()
+            await dp.start_polling(bot)  # Запускаем бота
+    finally:
+        render_service.shutdown()
 
 
 if __name__ == "__main__":
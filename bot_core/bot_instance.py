@@ -3,6 +3,8 @@ import os
 from aiogram import Bot
 from dotenv import load_dotenv
 
+from bot_core.outbound import OutboundLimiter
+
 load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN", "")
 CHAT_ID: str = os.getenv("CHAT_ID", "")
@@ -11,3 +13,5 @@ if not BOT_TOKEN:
     raise ValueError("BOT_TOKEN не найден")
 
 bot = Bot(token=BOT_TOKEN)
+# Все исходящие сообщения проходят через общую очередь с лимитами Telegram
+bot.session.middleware(OutboundLimiter())
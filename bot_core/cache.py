@@ -0,0 +1,237 @@
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime
+from time import monotonic
+from typing import Dict, List, Optional, Set, Tuple
+
+import pytz
+from sqlalchemy.future import select
+
+from db.models import DEFAULT_TZ, User
+from db.queries import (active_sleep_query, bump_data_version_query,
+                        data_version_query, open_sleeps_query, user_query)
+
+PLOT_CACHE_MAX_BYTES = int(os.getenv("PLOT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+PLOT_CACHE_MAX_ENTRIES = int(os.getenv("PLOT_CACHE_MAX_ENTRIES", "1024"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "100000"))
+# true — одни и те же чаты обслуживают несколько экземпляров бота (webhook
+# за балансировщиком): кэши сверяются с БД ценой лишних запросов. Один
+# экземпляр и режим BOT_WORKERS (чат закреплён за процессом) этого не требуют.
+SHARED_REPLICAS = os.getenv("SHARED_REPLICAS", "false").lower() == "true"
+# Брать активный сон из БД, а не только из индекса в памяти
+ACTIVE_SLEEP_DB_FALLBACK = os.getenv("ACTIVE_SLEEP_DB_FALLBACK", str(SHARED_REPLICAS)).lower() == "true"
+# Через сколько секунд перечитывать часовой пояс пользователя при SHARED_REPLICAS
+USER_TIMEZONE_TTL = float(os.getenv("USER_TIMEZONE_TTL", "60"))
+
+# (chat_id, тип графика, период, дата построения, версия данных)
+PlotKey = Tuple[int, str, str, date, int]
+
+
+@dataclass
+class CachedPlot:
+    png: Optional[bytes] = None
+    # file_id фото после первой отправки: дальше картинку не нужно загружать
+    file_id: Optional[str] = None
+
+    @property
+    def size(self) -> int:
+        return len(self.png) if self.png else 0
+
+
+class PlotCache:
+    """
+    LRU-кэш готовых диаграмм с ограничением по числу записей и объёму PNG.
+
+    Ключ включает версию данных пользователя: обработчики записи вызывают
+    bump() до коммита, после чего старые диаграммы этого пользователя
+    удаляются. При shared версия хранится в users.data_version, поэтому
+    запись через другой экземпляр бота тоже делает диаграммы устаревшими.
+    """
+
+    def __init__(self, max_bytes: int = PLOT_CACHE_MAX_BYTES, max_entries: int = PLOT_CACHE_MAX_ENTRIES,
+                 shared: bool = SHARED_REPLICAS):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.shared = shared
+        self._entries: "OrderedDict[PlotKey, CachedPlot]" = OrderedDict()
+        self._chat_keys: Dict[int, Set[PlotKey]] = {}
+        self._versions: Dict[int, int] = {}
+        self._bytes = 0
+
+    async def key(self, db, chat_id: int, plot_type: str, period: str, today: date) -> PlotKey:
+        if self.shared:
+            version = await db.scalar(data_version_query(chat_id)) or 0
+        else:
+            version = self._versions.get(chat_id, 0)
+        return chat_id, plot_type, period, today, version
+
+    async def bump(self, db, chat_id: int) -> None:
+        """Данные пользователя изменились — все его диаграммы устарели. Коммит за вызывающим."""
+        if self.shared:
+            await db.execute(bump_data_version_query(chat_id))
+        self._versions[chat_id] = self._versions.get(chat_id, 0) + 1
+        for key in self._chat_keys.pop(chat_id, set()):
+            self._bytes -= self._entries.pop(key).size
+
+    def get(self, key: PlotKey) -> Optional[CachedPlot]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: PlotKey, png: bytes) -> None:
+        self._discard(key)
+        self._entries[key] = CachedPlot(png=png)
+        self._chat_keys.setdefault(key[0], set()).add(key)
+        self._bytes += len(png)
+        self._evict()
+
+    def set_file_id(self, key: PlotKey, file_id: str) -> None:
+        """Запоминает file_id и освобождает PNG: Telegram уже хранит картинку."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        self._bytes -= entry.size
+        entry.png = None
+        entry.file_id = file_id
+
+    def _discard(self, key: PlotKey) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry.size
+        chat_keys = self._chat_keys.get(key[0])
+        if chat_keys is not None:
+            chat_keys.discard(key)
+            if not chat_keys:
+                del self._chat_keys[key[0]]
+
+    def _evict(self) -> None:
+        while self._entries and (
+            self._bytes > self.max_bytes or len(self._entries) > self.max_entries
+        ):
+            self._discard(next(iter(self._entries)))
+
+
+class UserRegistry:
+    """
+    LRU-кэш зарегистрированных пользователей и их часовых поясов.
+
+    Пользователи почти никогда не удаляются, поэтому кэшируются только
+    положительные ответы: промах проверяется в БД. При shared часовой пояс
+    перечитывается из БД через timezone_ttl секунд — его могли сменить через
+    другой экземпляр бота.
+    """
+
+    def __init__(self, max_size: int = USER_CACHE_SIZE, shared: bool = SHARED_REPLICAS,
+                 timezone_ttl: float = USER_TIMEZONE_TTL):
+        self.max_size = max_size
+        self.shared = shared
+        self.timezone_ttl = timezone_ttl
+        # chat_id -> (часовой пояс пользователя, когда прочитан)
+        self._users: "OrderedDict[int, Tuple[str, float]]" = OrderedDict()
+
+    def add(self, chat_id: int, timezone: str = DEFAULT_TZ.zone) -> None:
+        self._users[chat_id] = timezone, monotonic()
+        self._users.move_to_end(chat_id)
+        if len(self._users) > self.max_size:
+            self._users.popitem(last=False)
+
+    def discard(self, chat_id: int) -> None:
+        self._users.pop(chat_id, None)
+
+    async def warm(self, db) -> None:
+        """Загружает пользователей из БД при старте."""
+        result = await db.execute(select(User.chat_id, User.timezone).limit(self.max_size))
+        for chat_id, timezone in result:
+            self.add(chat_id, timezone)
+
+    async def is_registered(self, db, chat_id: int) -> bool:
+        if chat_id in self._users:
+            self._users.move_to_end(chat_id)
+            return True
+        user = await db.scalar(user_query(chat_id))
+        if user is None:
+            return False
+        self.add(chat_id, user.timezone)
+        return True
+
+    async def timezone(self, db, chat_id: int):
+        """Часовой пояс пользователя (pytz); для незарегистрированных — DEFAULT_TZ."""
+        if not await self.is_registered(db, chat_id):
+            return DEFAULT_TZ
+        timezone, loaded_at = self._users[chat_id]
+        if self.shared and monotonic() - loaded_at > self.timezone_ttl:
+            user = await db.scalar(user_query(chat_id))
+            if user is None:
+                self.discard(chat_id)
+                return DEFAULT_TZ
+            timezone = user.timezone
+            self.add(chat_id, timezone)
+        return pytz.timezone(timezone)
+
+
+@dataclass(frozen=True)
+class ActiveSleep:
+    id: int
+    start_time: datetime
+
+
+class ActiveSleepIndex:
+    """
+    Незавершённые сны по чатам.
+
+    Восстанавливается при старте одним запросом по end_time IS NULL и
+    обновляется обработчиками при начале и завершении сна. До rebuild()
+    промахи проверяются в БД. При db_fallback (несколько экземпляров бота)
+    активный сон всегда берётся из БД: его мог начать или завершить другой
+    экземпляр, а индекс лишь повторяет ответ.
+    """
+
+    def __init__(self, db_fallback: bool = ACTIVE_SLEEP_DB_FALLBACK):
+        self.db_fallback = db_fallback
+        # Сны чата отсортированы по start_time, активным считается последний
+        self._active: Dict[int, List[ActiveSleep]] = {}
+        self._loaded = False
+
+    async def rebuild(self, db) -> None:
+        active: Dict[int, List[ActiveSleep]] = {}
+        result = await db.execute(open_sleeps_query())
+        for chat_id, sleep_id, start_time in result:
+            active.setdefault(chat_id, []).append(ActiveSleep(sleep_id, start_time))
+        self._active = active
+        self._loaded = True
+
+    def start(self, chat_id: int, sleep_id: int, start_time: datetime) -> None:
+        sleeps = self._active.setdefault(chat_id, [])
+        sleeps.append(ActiveSleep(sleep_id, start_time))
+        sleeps.sort(key=lambda sleep: sleep.start_time)
+
+    def end(self, chat_id: int, sleep_id: int) -> None:
+        sleeps = [sleep for sleep in self._active.get(chat_id, []) if sleep.id != sleep_id]
+        if sleeps:
+            self._active[chat_id] = sleeps
+        else:
+            self._active.pop(chat_id, None)
+
+    async def get(self, db, chat_id: int) -> Optional[ActiveSleep]:
+        if not self.db_fallback:
+            sleeps = self._active.get(chat_id)
+            if sleeps:
+                return sleeps[-1]
+            if self._loaded:
+                return None
+
+        record = (await db.execute(active_sleep_query(chat_id))).scalars().first()
+        if record is None:
+            self._active.pop(chat_id, None)
+            return None
+        active = ActiveSleep(record.id, record.start_time)
+        self._active[chat_id] = [active]
+        return active
+
+
+plot_cache = PlotCache()
+user_registry = UserRegistry()
+active_sleeps = ActiveSleepIndex()
@@ -0,0 +1,125 @@
+"""
+Выгрузка всей истории пользователя в CSV или Parquet.
+
+Записи читаются серверным курсором пачками по EXPORT_CHUNK строк и сразу
+дописываются во временный файл, поэтому расход памяти не зависит от объёма
+истории. Формат строк общий для кормлений и снов:
+kind (feeding / sleep), start_time, end_time, amount_ml; время — UTC, ISO 8601.
+"""
+import asyncio
+import csv
+import os
+import tempfile
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import DateTime, Integer, cast, literal, null
+from sqlalchemy.future import select
+
+from db.models import FeedingRecord, SleepRecord
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet доступен только с установленным pyarrow
+    pa = None
+
+EXPORT_CHUNK = int(os.getenv("EXPORT_CHUNK", "5000"))
+
+EXPORT_COLUMNS = ("kind", "start_time", "end_time", "amount_ml")
+
+Row = Tuple[str, datetime, Optional[datetime], Optional[int]]
+
+
+def export_formats() -> List[str]:
+    """Форматы, доступные в этой установке."""
+    return ["csv", "parquet"] if pa is not None else ["csv"]
+
+
+class _CsvWriter:
+    def __init__(self, path: str):
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(EXPORT_COLUMNS)
+
+    def write(self, rows: List[Row]) -> None:
+        self._writer.writerows(
+            (kind, start.isoformat(), end.isoformat() if end else None, amount)
+            for kind, start, end, amount in rows
+        )
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class _ParquetWriter:
+    def __init__(self, path: str):
+        self._schema = pa.schema(
+            [
+                ("kind", pa.string()),
+                ("start_time", pa.timestamp("us", tz="UTC")),
+                ("end_time", pa.timestamp("us", tz="UTC")),
+                ("amount_ml", pa.int32()),
+            ]
+        )
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def write(self, rows: List[Row]) -> None:
+        columns = list(zip(*rows))
+        self._writer.write_table(pa.table(columns, schema=self._schema))
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+def _history_queries(chat_id: int):
+    """Запросы только нужных колонок (без ORM-объектов) в формате EXPORT_COLUMNS."""
+    feedings = (
+        select(
+            literal("feeding"),
+            FeedingRecord.timestamp,
+            cast(null(), DateTime(timezone=True)),
+            FeedingRecord.amount,
+        )
+        .where(FeedingRecord.chat_id == chat_id)
+        .order_by(FeedingRecord.timestamp)
+    )
+    sleeps = (
+        select(
+            literal("sleep"),
+            SleepRecord.start_time,
+            SleepRecord.end_time,
+            cast(null(), Integer),
+        )
+        .where(SleepRecord.chat_id == chat_id)
+        .order_by(SleepRecord.start_time)
+    )
+    return feedings, sleeps
+
+
+async def export_history(db_session, chat_id: int, fmt: str = "csv") -> str:
+    """
+    Записывает историю пользователя во временный файл и возвращает путь к нему.
+    Удалить файл после отправки — задача вызывающего кода.
+    """
+    if fmt not in export_formats():
+        raise ValueError(f"Формат {fmt} недоступен")
+
+    handle, path = tempfile.mkstemp(prefix=f"export_{chat_id}_", suffix=f".{fmt}")
+    os.close(handle)
+    try:
+        writer = await asyncio.to_thread(_ParquetWriter if fmt == "parquet" else _CsvWriter, path)
+        try:
+            for query in _history_queries(chat_id):
+                result = await db_session.stream(
+                    query.execution_options(yield_per=EXPORT_CHUNK)
+                )
+                async for rows in result.partitions():
+                    # Запись в файл не должна держать цикл событий
+                    await asyncio.to_thread(writer.write, [tuple(row) for row in rows])
+        finally:
+            await asyncio.to_thread(writer.close)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
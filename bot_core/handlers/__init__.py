@@ -1,9 +1,13 @@
 # handlers/__init__.py
 
+from .export import router as export_router
 from .feeding import router as feeding_router
+from .importer import router as import_router
 from .polts import router as plots_router
 from .sleep import router as sleep_router
 from .start import router as start_router
 from .stats import router as stats_router
+from .timezone import router as timezone_router
 
-__all__ = ["sleep_router", "feeding_router", "stats_router", "start_router", "plots_router"]
+__all__ = ["sleep_router", "feeding_router", "stats_router", "start_router", "plots_router",
+           "export_router", "import_router", "timezone_router"]
@@ -0,0 +1,33 @@
+import os
+
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import FSInputFile, Message
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot_core.export import export_formats, export_history
+from bot_core.keyboards import main_keyboard
+from db.database import release_connection
+
+router = Router()
+
+
+@router.message(Command("export"))
+async def export_handler(message: Message, command: CommandObject, db: AsyncSession):
+    """/export [csv|parquet] — вся история кормлений и сна файлом."""
+    fmt = (command.args or "csv").strip().lower()
+    if fmt not in export_formats():
+        await message.answer(
+            "Доступные форматы: " + ", ".join(export_formats()), reply_markup=main_keyboard
+        )
+        return
+
+    await message.answer("⏳ Готовлю выгрузку...")
+    path = await export_history(db, message.chat.id, fmt)
+    await release_connection(db)
+    try:
+        await message.answer_document(
+            FSInputFile(path, filename=f"history.{fmt}"), reply_markup=main_keyboard
+        )
+    finally:
+        os.remove(path)
@@ -1,11 +1,14 @@
+from datetime import datetime, timezone
+
 from aiogram import Router
 from aiogram.types import Message
-from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from bot_core.cache import active_sleeps, plot_cache, user_registry
 from bot_core.keyboards import (feed_keyboard, main_keyboard,
                                 sleep_actions_keyboard)
-from db.database import get_db
-from db.models import FeedingRecord, SleepRecord
+from db.models import FeedingRecord
+from db.rollups import add_feeding
 
 router = Router()
 
@@ -16,20 +19,18 @@ async def ask_feed_amount(message: Message):
 
 
 @router.message(lambda m: m.text and m.text.isdigit())
-async def save_feed_amount(message: Message):
+async def save_feed_amount(message: Message, db: AsyncSession):
     amount = int(message.text)
     chat_id = message.chat.id
+    now = datetime.now(timezone.utc)
+    tz = await user_registry.timezone(db, chat_id)
 
-    async for db in get_db():
-        db.add(FeedingRecord(chat_id=chat_id, amount=amount))
-        await db.commit()
+    db.add(FeedingRecord(chat_id=chat_id, amount=amount, timestamp=now))
+    await add_feeding(db, chat_id, now, amount, tz)
+    await plot_cache.bump(db, chat_id)
+    await db.commit()
 
-        result = await db.execute(
-            select(SleepRecord).where(
-                SleepRecord.chat_id == chat_id, SleepRecord.end_time.is_(None)
-            )
-        )
-        active_sleep = result.scalars().first()
+    active_sleep = await active_sleeps.get(db, chat_id)
 
     markup = sleep_actions_keyboard if active_sleep else main_keyboard
     await message.answer(f"Сохранено: {amount} мл", reply_markup=markup)
@@ -0,0 +1,61 @@
+import asyncio
+from zoneinfo import ZoneInfo
+
+from aiogram import F, Router
+from aiogram.filters import Command
+from aiogram.types import Message
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot_core.cache import plot_cache, user_registry
+from bot_core.importer import ImportFailed, import_history, parse_history
+from bot_core.keyboards import main_keyboard
+
+router = Router()
+
+# Ограничение Bot API на скачивание файлов ботом
+IMPORT_MAX_BYTES = 20 * 1024 * 1024
+
+
+@router.message(Command("import"))
+async def import_help(message: Message):
+    await message.answer(
+        "Отправьте CSV-файл с колонками kind, start_time, end_time, amount_ml "
+        "(как в /export). kind — feeding или sleep, время — ISO 8601, "
+        "без часового пояса считается местным (см. /timezone).",
+        reply_markup=main_keyboard,
+    )
+
+
+@router.message(F.document.file_name.lower().endswith(".csv"))
+async def import_file(message: Message, db: AsyncSession):
+    chat_id = message.chat.id
+    if not await user_registry.is_registered(db, chat_id):
+        await message.answer("Сначала нажмите /start")
+        return
+    if message.document.file_size and message.document.file_size > IMPORT_MAX_BYTES:
+        await message.answer("Файл больше 20 МБ, разделите его на части.")
+        return
+
+    zone = ZoneInfo((await user_registry.timezone(db, chat_id)).zone)
+    content = await message.bot.download(message.document)
+    try:
+        history = await asyncio.to_thread(parse_history, content.read(), zone)
+    except ImportFailed as error:
+        await message.answer("❌ Файл не загружен:\n" + "\n".join(error.errors))
+        return
+
+    status = await message.answer(f"⏳ Загружаю записей: {history.total}")
+
+    async def progress(done: int, total: int) -> None:
+        await status.edit_text(f"⏳ Загружено {done} из {total}")
+
+    report = await import_history(db, chat_id, history, progress)
+    await plot_cache.bump(db, chat_id)
+    await db.commit()
+
+    await message.answer(
+        f"✅ Импорт завершён: кормлений — {report.feedings}, снов — {report.sleeps}"
+        + (f", пропущено повторов — {report.skipped}" if report.skipped else "")
+        + (f", пропущено незавершённых снов — {report.open_sleeps}" if report.open_sleeps else ""),
+        reply_markup=main_keyboard,
+    )
@@ -1,9 +1,17 @@
+from dataclasses import replace
+from datetime import datetime
+
 from aiogram import Router
+from aiogram.fsm.context import FSMContext
 from aiogram.types import (BufferedInputFile, KeyboardButton, Message,
                            ReplyKeyboardMarkup)
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from bot_core.cache import plot_cache, user_registry
 from bot_core.keyboards import main_keyboard
-from bot_core.plots import generate_feeding_plot, generate_sleep_plot
+from bot_core.plots import fetch_plot_data, render_plot
+from bot_core.render import RenderQueueFull
+from db.database import release_connection
 
 router = Router()
 
@@ -11,6 +19,7 @@ router = Router()
 diagram_type_kb = ReplyKeyboardMarkup(
     keyboard=[
         [KeyboardButton(text="🍼 Кормление"), KeyboardButton(text="😴 Сон")],
+        [KeyboardButton(text="📋 Дашборд")],
         [KeyboardButton(text="🔙 Назад")],
     ],
     resize_keyboard=True,
@@ -27,8 +36,10 @@ plot_period_kb = ReplyKeyboardMarkup(
     resize_keyboard=True,
 )
 
-# Хранилище текущего выбора типа (можно заменить на FSM при необходимости)
-user_plot_type = {}
+
+def plot_choice(state: FSMContext) -> FSMContext:
+    """Выбор типа диаграммы хранится отдельно от FSM диалогов сна."""
+    return FSMContext(storage=state.storage, key=replace(state.key, destiny="plot"))
 
 
 @router.message(lambda m: m.text == "Диаграммы")
@@ -36,18 +47,19 @@ async def show_plot_options(message: Message):
     await message.answer("Что вы хотите посмотреть?", reply_markup=diagram_type_kb)
 
 
-@router.message(lambda m: m.text in {"🍼 Кормление", "😴 Сон"})
-async def choose_plot_type(message: Message):
-    user_plot_type[message.chat.id] = (
-        "feeding" if message.text == "🍼 Кормление" else "sleep"
-    )
+PLOT_TYPES = {"🍼 Кормление": "feeding", "😴 Сон": "sleep", "📋 Дашборд": "dashboard"}
+
+
+@router.message(lambda m: m.text in PLOT_TYPES)
+async def choose_plot_type(message: Message, state: FSMContext):
+    await plot_choice(state).update_data(plot_type=PLOT_TYPES[message.text])
     await message.answer("Выберите период:", reply_markup=plot_period_kb)
 
 
 @router.message(
     lambda m: m.text in {"📊 За 7 дней", "📊 За 30 дней", "📊 За всё время"}
 )
-async def send_plot_by_period(message: Message):
+async def send_plot_by_period(message: Message, state: FSMContext, db: AsyncSession):
     chat_id = int(message.chat.id)
     period_map = {
         "📊 За 7 дней": "7d",
@@ -56,19 +68,40 @@ async def send_plot_by_period(message: Message):
     }
     period = period_map.get(message.text, "7d")
 
-    plot_type = user_plot_type.get(chat_id)
+    plot_type = (await plot_choice(state).get_data()).get("plot_type")
     if plot_type == "feeding":
-        buffer = await generate_feeding_plot(chat_id, period=period)
         caption = f"🍼 Кормления ({message.text})"
     elif plot_type == "sleep":
-        buffer = await generate_sleep_plot(chat_id, period=period)
         caption = f"😴 Сон ({message.text})"
+    elif plot_type == "dashboard":
+        caption = f"📋 Сводка ({message.text})"
     else:
         await message.answer("Ошибка: не выбран тип диаграммы.")
         return
 
-    image = BufferedInputFile(buffer.read(), filename="plot.png")
-    await message.answer_photo(photo=image, caption=caption)
+    tz = await user_registry.timezone(db, chat_id)
+    key = await plot_cache.key(db, chat_id, plot_type, period, datetime.now(tz).date())
+    cached = plot_cache.get(key)
+    if cached and cached.file_id:
+        # Данные не менялись — отправляем уже загруженную картинку по file_id
+        await message.answer_photo(photo=cached.file_id, caption=caption)
+        return
+
+    if cached:
+        png = cached.png
+    else:
+        dates, table = await fetch_plot_data(db, chat_id, plot_type, period, tz)
+        await release_connection(db)
+        try:
+            png = await render_plot(plot_type, dates, table)
+        except RenderQueueFull:
+            await message.answer("Сейчас строится слишком много диаграмм, попробуйте чуть позже.")
+            return
+        plot_cache.put(key, png)
+
+    image = BufferedInputFile(png, filename="plot.png")
+    sent = await message.answer_photo(photo=image, caption=caption)
+    plot_cache.set_file_id(key, sent.photo[-1].file_id)
 
 
 @router.message(lambda m: m.text == "🔙 Назад")
@@ -4,23 +4,24 @@ import pytz
 from aiogram import Router
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
-from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from bot_core.bot_instance import CHAT_ID
+from bot_core.cache import active_sleeps, plot_cache, user_registry
 from bot_core.keyboards import (date_choice_keyboard, main_keyboard,
                                 sleep_actions_keyboard, sleep_keyboard)
 from bot_core.states import ManualEndSleepState, ManualSleepStartState
 from bot_core.utils import format_minutes
-from db.database import get_db
-from db.models import SleepRecord, User
+from db.models import SleepRecord
+from db.queries import end_sleep_query
+from db.rollups import add_sleep
 
-TZ = pytz.timezone("Europe/Moscow")
 router = Router()
 
 
 @router.message(lambda m: m.text == "Сон")
-async def ask_sleep_time(message: Message):
-    now = datetime.now(TZ).strftime("%H:%M")
+async def ask_sleep_time(message: Message, db: AsyncSession):
+    tz = await user_registry.timezone(db, message.chat.id)
+    now = datetime.now(tz).strftime("%H:%M")
     await message.answer(
         f"Текущее время сна: {now}\n"
         "Нажмите '✅ Подтвердить' для записи или '✏ Изменить время' для ввода вручную.",
@@ -29,14 +30,14 @@ async def ask_sleep_time(message: Message):
 
 
 @router.message(lambda m: m.text == "✅ Подтвердить")
-async def confirm_sleep_time(message: Message):
-    now = datetime.now(TZ).astimezone(pytz.utc)
-    async for db in get_db():
-        user = await db.scalar(select(User).where(User.chat_id == message.chat.id))
-        if not user:
-            return await message.answer("Вы не зарегистрированы.")
-        db.add(SleepRecord(chat_id=user.chat_id, start_time=now))
-        await db.commit()
+async def confirm_sleep_time(message: Message, db: AsyncSession):
+    now = datetime.now(pytz.utc)
+    if not await user_registry.is_registered(db, message.chat.id):
+        return await message.answer("Вы не зарегистрированы.")
+    sleep = SleepRecord(chat_id=message.chat.id, start_time=now)
+    db.add(sleep)
+    await db.commit()
+    active_sleeps.start(sleep.chat_id, sleep.id, sleep.start_time)
 
     await message.answer("Сон зафиксирован.", reply_markup=sleep_actions_keyboard)
 
@@ -51,7 +52,7 @@ async def change_sleep_time(message: Message, state: FSMContext):
 async def manual_sleep_time_input(message: Message, state: FSMContext):
     try:
         custom_time = datetime.strptime(message.text, "%H:%M").time()
-        await state.update_data(custom_time=custom_time)
+        await state.update_data(custom_time=custom_time.strftime("%H:%M"))
         await state.set_state(ManualSleepStartState.waiting_for_date_choice)
 
         await message.answer(
@@ -66,7 +67,7 @@ async def manual_wake_up_time_input(message: Message, state: FSMContext):
     """Сохраняем введенное время и запрашиваем дату."""
     try:
         custom_time = datetime.strptime(message.text, "%H:%M").time()
-        await state.update_data(custom_time=custom_time)
+        await state.update_data(custom_time=custom_time.strftime("%H:%M"))
         await state.set_state(ManualEndSleepState.waiting_for_date_choice)
 
         await message.answer("Выберите дату:", reply_markup=date_choice_keyboard)
@@ -82,106 +83,114 @@ async def manual_wake_up_start(message: Message, state: FSMContext):
 
 
 @router.message(ManualSleepStartState.waiting_for_date_choice)
-async def manual_sleep_date_choice(message: Message, state: FSMContext):
+async def manual_sleep_date_choice(message: Message, state: FSMContext, db: AsyncSession):
     data = await state.get_data()
-    date = datetime.today().date()
+    if not await user_registry.is_registered(db, message.chat.id):
+        return await message.answer("Вы не зарегистрированы.")
+
+    tz = await user_registry.timezone(db, message.chat.id)
+    date = datetime.now(tz).date()
     if message.text == "Вчера":
         date -= timedelta(days=1)
-    dt = datetime.combine(date, data["custom_time"])
-    dt = TZ.localize(dt).astimezone(pytz.utc)
+    custom_time = datetime.strptime(data["custom_time"], "%H:%M").time()
+    dt = datetime.combine(date, custom_time)
+    dt = tz.localize(dt).astimezone(pytz.utc)
 
-    async for db in get_db():
-        user = await db.scalar(select(User).where(User.chat_id == message.chat.id))
-        if not user:
-            return await message.answer("Вы не зарегистрированы.")
-        db.add(SleepRecord(chat_id=user.chat_id, start_time=dt))
-        await db.commit()
+    sleep = SleepRecord(chat_id=message.chat.id, start_time=dt)
+    db.add(sleep)
+    await db.commit()
+    active_sleeps.start(sleep.chat_id, sleep.id, sleep.start_time)
 
     await state.clear()
     await message.answer("Сон зафиксирован!", reply_markup=sleep_actions_keyboard)
 
 
 @router.message(ManualEndSleepState.waiting_for_date_choice)
-async def manual_wake_up_date_choice(message: Message, state: FSMContext):
-    chat_id = int(CHAT_ID)
+async def manual_wake_up_date_choice(message: Message, state: FSMContext, db: AsyncSession):
+    chat_id = message.chat.id
     data = await state.get_data()
 
     if message.text not in ["Сегодня", "Вчера"]:
         await message.answer("Пожалуйста, выберите 'Сегодня' или 'Вчера'.")
         return
 
+    if not await user_registry.is_registered(db, chat_id):
+        await message.answer("Ошибка! Вы не зарегистрированы. Отправьте /start.")
+        await state.clear()
+        return
+
     # Получаем дату и объединяем с временем
-    chosen_date = datetime.today().date()
+    tz = await user_registry.timezone(db, chat_id)
+    chosen_date = datetime.now(tz).date()
     if message.text == "Вчера":
         chosen_date = chosen_date - timedelta(days=1)
 
-    combined_datetime = datetime.combine(chosen_date, data["custom_time"])
-    combined_datetime = TZ.localize(combined_datetime).astimezone(pytz.utc)
+    custom_time = datetime.strptime(data["custom_time"], "%H:%M").time()
+    combined_datetime = datetime.combine(chosen_date, custom_time)
+    combined_datetime = tz.localize(combined_datetime).astimezone(pytz.utc)
 
-    async for db_session in get_db():
-        result = await db_session.execute(select(User).where(User.chat_id == chat_id))
-        user = result.scalars().first()
+    # Находим активный сон
+    sleep = await active_sleeps.get(db, chat_id)
 
-        if not user:
-            await message.answer("Ошибка! Вы не зарегистрированы. Отправьте /start.")
-            await state.clear()
-            return
+    if not sleep:
+        await message.answer("Не найдено активного сна.")
+        await state.clear()
+        return
 
-        # Находим активный сон
-        result = await db_session.execute(
-            select(SleepRecord)
-            .where(SleepRecord.chat_id == chat_id, SleepRecord.end_time.is_(None))
-            .order_by(SleepRecord.start_time.desc())
+    if sleep.start_time > combined_datetime:
+        await message.answer(
+            "Время окончания сна не может быть раньше времени начала сна!"
         )
-        sleep_record = result.scalars().first()
-
-        if not sleep_record:
-            await message.answer("Не найдено активного сна.")
-            await state.clear()
-            return
-
-        if sleep_record.start_time > combined_datetime:
-            await message.answer(
-                "Время окончания сна не может быть раньше времени начала сна!"
-            )
-            await state.clear()
-            return
+        await state.clear()
+        return
 
-        # Записываем завершение сна
-        sleep_record.end_time = combined_datetime
-        await db_session.commit()
+    # Записываем завершение сна
+    result = await db.execute(end_sleep_query(sleep.id, combined_datetime))
+    if result.rowcount == 0:
+        await db.rollback()
+        active_sleeps.end(chat_id, sleep.id)
+        await message.answer("Активный сон не найден.", reply_markup=main_keyboard)
+        await state.clear()
+        return
+    await add_sleep(db, chat_id, sleep.start_time, combined_datetime, tz)
+    await plot_cache.bump(db, chat_id)
+    await db.commit()
+    active_sleeps.end(chat_id, sleep.id)
 
-        duration = ((sleep_record.end_time - sleep_record.start_time).seconds) // 60
-        await message.answer(
-            f"Сон завершён вручную! Продолжительность: {format_minutes(duration)}",
-            reply_markup=main_keyboard,
-        )
+    duration = ((combined_datetime - sleep.start_time).seconds) // 60
+    await message.answer(
+        f"Сон завершён вручную! Продолжительность: {format_minutes(duration)}",
+        reply_markup=main_keyboard,
+    )
 
     await state.clear()
 
 
 @router.message(lambda m: m.text == "Завершить сон")
-async def wake_up(message: Message):
-    now = datetime.now(TZ).astimezone(pytz.utc)
-    async for db in get_db():
-        user = await db.scalar(select(User).where(User.chat_id == message.chat.id))
-        if not user:
-            return await message.answer("Вы не зарегистрированы.")
-
-        result = await db.execute(
-            select(SleepRecord)
-            .where(SleepRecord.chat_id == user.chat_id, SleepRecord.end_time.is_(None))
-            .order_by(SleepRecord.start_time.desc())
-        )
-        sleep = result.scalars().first()
-        if not sleep:
-            return await message.answer("Активный сон не найден.")
-
-        sleep.end_time = now
-        await db.commit()
-
-        minutes = int((sleep.end_time - sleep.start_time).total_seconds() // 60)
-        await message.answer(
-            f"Сон завершён! Продолжительность: {format_minutes(minutes)}",
-            reply_markup=main_keyboard,
-        )
+async def wake_up(message: Message, db: AsyncSession):
+    now = datetime.now(pytz.utc)
+    chat_id = message.chat.id
+    if not await user_registry.is_registered(db, chat_id):
+        return await message.answer("Вы не зарегистрированы.")
+    tz = await user_registry.timezone(db, chat_id)
+
+    sleep = await active_sleeps.get(db, chat_id)
+    if not sleep:
+        return await message.answer("Активный сон не найден.")
+
+    result = await db.execute(end_sleep_query(sleep.id, now))
+    if result.rowcount == 0:
+        # Сон уже завершён: индекс устарел
+        await db.rollback()
+        active_sleeps.end(chat_id, sleep.id)
+        return await message.answer("Активный сон не найден.", reply_markup=main_keyboard)
+    await add_sleep(db, chat_id, sleep.start_time, now, tz)
+    await plot_cache.bump(db, chat_id)
+    await db.commit()
+    active_sleeps.end(chat_id, sleep.id)
+
+    minutes = int((now - sleep.start_time).total_seconds() // 60)
+    await message.answer(
+        f"Сон завершён! Продолжительность: {format_minutes(minutes)}",
+        reply_markup=main_keyboard,
+    )
@@ -1,6 +1,8 @@
 from aiogram import Router
 from aiogram.types import Message
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from bot_core.cache import user_registry
 from bot_core.keyboards import main_keyboard
 from bot_core.statistics import build_statistics_text
 
@@ -8,7 +10,8 @@ router = Router()
 
 
 @router.message(lambda m: m.text == "Статистика")
-async def send_statistics(message: Message):
+async def send_statistics(message: Message, db: AsyncSession):
     chat_id = message.chat.id
-    text = await build_statistics_text(chat_id)
+    tz = await user_registry.timezone(db, chat_id)
+    text = await build_statistics_text(db, chat_id, tz)
     await message.answer(text, parse_mode="HTML", reply_markup=main_keyboard)
@@ -0,0 +1,53 @@
+from datetime import datetime
+
+import pytz
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot_core.cache import plot_cache, user_registry
+from bot_core.keyboards import main_keyboard
+from db.queries import set_timezone_query
+from db.rollups import rebuild
+
+router = Router()
+
+
+@router.message(Command("timezone"))
+async def timezone_handler(message: Message, command: CommandObject, db: AsyncSession):
+    """/timezone [Europe/Berlin] — показать или сменить часовой пояс."""
+    chat_id = message.chat.id
+    if not await user_registry.is_registered(db, chat_id):
+        await message.answer("Сначала нажмите /start")
+        return
+
+    if not command.args:
+        tz = await user_registry.timezone(db, chat_id)
+        await message.answer(
+            f"Часовой пояс: {tz.zone} (сейчас {datetime.now(tz).strftime('%H:%M')}).\n"
+            "Чтобы сменить, отправьте /timezone Europe/Berlin",
+            reply_markup=main_keyboard,
+        )
+        return
+
+    try:
+        tz = pytz.timezone(command.args.strip())
+    except pytz.UnknownTimeZoneError:
+        await message.answer(
+            "Неизвестный часовой пояс. Укажите его как Europe/Moscow или Asia/Almaty.",
+            reply_markup=main_keyboard,
+        )
+        return
+
+    # Даты записей пересчитывает триггер, суточные итоги — rebuild
+    await db.execute(set_timezone_query(chat_id, tz.zone))
+    await rebuild(db, [chat_id])
+    await plot_cache.bump(db, chat_id)
+    await db.commit()
+    user_registry.add(chat_id, tz.zone)
+
+    await message.answer(
+        f"✅ Часовой пояс: {tz.zone} (сейчас {datetime.now(tz).strftime('%H:%M')})",
+        reply_markup=main_keyboard,
+    )
@@ -0,0 +1,159 @@
+"""
+Импорт истории из CSV.
+
+Формат тот же, что у выгрузки (bot_core/export.py):
+kind (feeding / sleep), start_time, end_time, amount_ml. Время в ISO 8601;
+время без часового пояса считается местным временем пользователя. Строки загружаются через
+COPY во временные таблицы пачками по IMPORT_BATCH, а в основные таблицы
+переносятся только записи, которых там ещё нет, — повторный импорт того же
+файла ничего не дублирует. Незавершённые сны (пустой end_time) пропускаются.
+"""
+import csv
+import io
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import text
+
+from db.models import DEFAULT_TZ
+from db.rollups import rebuild
+
+LOCAL_ZONE = ZoneInfo(DEFAULT_TZ.zone)
+
+IMPORT_BATCH = int(os.getenv("IMPORT_BATCH", "5000"))
+# Сколько ошибок показывать пользователю
+IMPORT_MAX_ERRORS = 5
+
+Progress = Callable[[int, int], Awaitable[None]]
+
+
+class ImportFailed(Exception):
+    """Файл не прошёл проверку; в errors — описания проблемных строк."""
+
+    def __init__(self, errors: List[str]):
+        super().__init__("\n".join(errors))
+        self.errors = errors
+
+
+@dataclass
+class ParsedHistory:
+    feedings: List[Tuple[datetime, int]] = field(default_factory=list)
+    sleeps: List[Tuple[datetime, datetime]] = field(default_factory=list)
+    # Сны без end_time: выгрузка пишет так активный сон
+    open_sleeps: int = 0
+
+    @property
+    def total(self) -> int:
+        return len(self.feedings) + len(self.sleeps)
+
+
+@dataclass
+class ImportReport:
+    feedings: int = 0
+    sleeps: int = 0
+    skipped: int = 0
+    open_sleeps: int = 0
+
+
+def _parse_time(value: str, zone: ZoneInfo) -> datetime:
+    moment = datetime.fromisoformat(value.strip())
+    if moment.tzinfo is None:
+        # zoneinfo на порядок быстрее pytz.localize на десятках тысяч строк
+        moment = moment.replace(tzinfo=zone)
+    return moment.astimezone(timezone.utc)
+
+
+def parse_history(content: bytes, zone: ZoneInfo = LOCAL_ZONE) -> ParsedHistory:
+    """Разбирает и проверяет CSV; время без пояса — в zone. При ошибках бросает ImportFailed."""
+    try:
+        reader = csv.DictReader(io.StringIO(content.decode("utf-8-sig")))
+    except UnicodeDecodeError:
+        raise ImportFailed(["Файл должен быть в кодировке UTF-8"])
+    missing = {"kind", "start_time"} - set(reader.fieldnames or ())
+    if missing:
+        raise ImportFailed(["Нет колонок: " + ", ".join(sorted(missing))])
+
+    history = ParsedHistory()
+    errors = []
+    for line, row in enumerate(reader, start=2):
+        try:
+            kind = (row.get("kind") or "").strip()
+            start = _parse_time(row["start_time"] or "", zone)
+            if kind == "feeding":
+                amount = int(row.get("amount_ml") or "")
+                if amount <= 0:
+                    raise ValueError("объём должен быть больше нуля")
+                history.feedings.append((start, amount))
+            elif kind == "sleep":
+                end_value = (row.get("end_time") or "").strip()
+                if not end_value:
+                    history.open_sleeps += 1
+                    continue
+                end = _parse_time(end_value, zone)
+                if end <= start:
+                    raise ValueError("конец сна раньше начала")
+                history.sleeps.append((start, end))
+            else:
+                raise ValueError(f"неизвестный тип записи «{kind}»")
+        except (TypeError, ValueError) as error:
+            errors.append(f"Строка {line}: {error}")
+            if len(errors) >= IMPORT_MAX_ERRORS:
+                break
+    if errors:
+        raise ImportFailed(errors)
+    return history
+
+
+async def _copy(connection, table: str, columns: Tuple[str, ...], records: list,
+                done: int, total: int, progress: Optional[Progress]) -> int:
+    for offset in range(0, len(records), IMPORT_BATCH):
+        batch = records[offset:offset + IMPORT_BATCH]
+        await connection.copy_records_to_table(table, records=batch, columns=columns)
+        done += len(batch)
+        if progress is not None:
+            await progress(done, total)
+    return done
+
+
+async def import_history(db_session, chat_id: int, history: ParsedHistory,
+                         progress: Optional[Progress] = None) -> ImportReport:
+    """
+    Загружает разобранную историю и пересчитывает суточные итоги пользователя.
+    Коммит остаётся за вызывающим кодом.
+    """
+    connection = await db_session.connection()
+    raw = (await connection.get_raw_connection()).driver_connection
+
+    await db_session.execute(text(
+        "CREATE TEMP TABLE import_feedings (timestamp timestamptz, amount integer) ON COMMIT DROP"
+    ))
+    await db_session.execute(text(
+        "CREATE TEMP TABLE import_sleeps (start_time timestamptz, end_time timestamptz) ON COMMIT DROP"
+    ))
+    done = await _copy(raw, "import_feedings", ("timestamp", "amount"),
+                       history.feedings, 0, history.total, progress)
+    await _copy(raw, "import_sleeps", ("start_time", "end_time"),
+                history.sleeps, done, history.total, progress)
+
+    feedings = await db_session.execute(text(
+        "INSERT INTO feeding_records (chat_id, timestamp, amount) "
+        "SELECT DISTINCT CAST(:chat_id AS bigint), i.timestamp, i.amount FROM import_feedings i "
+        "WHERE NOT EXISTS (SELECT 1 FROM feeding_records f WHERE f.chat_id = :chat_id "
+        "AND f.timestamp = i.timestamp AND f.amount = i.amount)"
+    ), {"chat_id": chat_id})
+    sleeps = await db_session.execute(text(
+        "INSERT INTO sleep_records (chat_id, start_time, end_time) "
+        "SELECT DISTINCT ON (i.start_time) CAST(:chat_id AS bigint), i.start_time, i.end_time FROM import_sleeps i "
+        "WHERE NOT EXISTS (SELECT 1 FROM sleep_records s WHERE s.chat_id = :chat_id "
+        "AND s.start_time = i.start_time)"
+    ), {"chat_id": chat_id})
+    await rebuild(db_session, [chat_id])
+
+    report = ImportReport(
+        feedings=feedings.rowcount, sleeps=sleeps.rowcount, open_sleeps=history.open_sleeps
+    )
+    report.skipped = history.total - report.feedings - report.sleeps
+    return report
@@ -0,0 +1,127 @@
+"""
+Метрики Prometheus (отдаются на /metrics, см. webhook.py).
+
+В режиме нескольких процессов (BOT_WORKERS > 1) задайте
+PROMETHEUS_MULTIPROC_DIR — пустой каталог, общий для всех процессов, —
+тогда /metrics собирает значения со всех обработчиков.
+"""
+import os
+from time import perf_counter
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.types import TelegramObject, Update
+from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter,
+                               Gauge, Histogram, generate_latest, multiprocess)
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from db.database import InstrumentedPool
+
+UPDATES = Counter("bot_updates_total", "Обработанные обновления", ["type", "status"])
+UPDATE_SECONDS = Histogram("bot_update_seconds", "Время обработки обновления", ["type"])
+HANDLER_SECONDS = Histogram("bot_handler_seconds", "Время работы обработчика", ["handler"])
+
+DB_QUERY_SECONDS = Histogram(
+    "bot_db_query_seconds", "Время SQL-запроса", ["operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+DB_POOL_WAIT_SECONDS = Histogram(
+    "bot_db_pool_checkout_seconds", "Ожидание соединения из пула",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+
+RENDER_SECONDS = Histogram("bot_render_seconds", "Время отрисовки графика", ["kind"])
+RENDER_PNG_BYTES = Histogram(
+    "bot_render_png_bytes", "Размер PNG графика", ["kind"],
+    buckets=(10_000, 25_000, 50_000, 100_000, 200_000, 500_000, 1_000_000),
+)
+
+OUTBOUND_QUEUE = Gauge(
+    "bot_outbound_queue", "Сообщения, ожидающие отправки", ["priority"],
+    multiprocess_mode="livesum",
+)
+OUTBOUND_WAIT_SECONDS = Histogram(
+    "bot_outbound_wait_seconds", "Ожидание очереди перед отправкой", ["priority"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+OUTBOUND_SENT = Counter("bot_outbound_sent_total", "Отправленные сообщения", ["priority"])
+OUTBOUND_RETRY_AFTER = Counter("bot_outbound_retry_after_total", "Ответы 429 от Telegram")
+
+NIGHTLY_SECONDS = Gauge(
+    "bot_nightly_duration_seconds", "Длительность последней ночной рассылки",
+    multiprocess_mode="liveall",
+)
+NIGHTLY_FAILURES = Counter("bot_nightly_failures_total", "Неудачные отправки ночной статистики")
+
+
+def render_metrics() -> tuple:
+    """Тело и Content-Type ответа /metrics."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Считает число и длительность SQL-запросов движка и ожидание соединения из пула."""
+    sync_engine = engine.sync_engine
+    if isinstance(sync_engine.pool, InstrumentedPool):
+        InstrumentedPool.wait_observer = DB_POOL_WAIT_SECONDS.observe
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        operation = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else "other"
+        DB_QUERY_SECONDS.labels(operation).observe(perf_counter() - started)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def failed(context):
+        stack = context.connection.info.get("query_started") if context.connection else None
+        if stack:
+            stack.pop()
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Внешний middleware dp.update: число и время обработки обновлений."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        kind = event.event_type
+        started = perf_counter()
+        try:
+            result = await handler(event, data)
+        except Exception:
+            UPDATES.labels(kind, "error").inc()
+            raise
+        finally:
+            UPDATE_SECONDS.labels(kind).observe(perf_counter() - started)
+        UPDATES.labels(kind, "unhandled" if result is UNHANDLED else "ok").inc()
+        return result
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Внутренний middleware: время работы конкретного обработчика."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        name = data["handler"].callback.__name__
+        started = perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            HANDLER_SECONDS.labels(name).observe(perf_counter() - started)
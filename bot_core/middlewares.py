@@ -0,0 +1,27 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from sqlalchemy.orm import sessionmaker
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    """
+    Одна сессия БД на обновление, передаётся в обработчик параметром db.
+
+    Соединение берётся из пула только при первом запросе сессии и
+    возвращается при commit/закрытии; незакоммиченные изменения откатываются.
+    """
+
+    def __init__(self, session_factory: sessionmaker):
+        self.session_factory = session_factory
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        async with self.session_factory() as session:
+            data["db"] = session
+            return await handler(event, data)
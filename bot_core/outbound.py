@@ -0,0 +1,181 @@
+"""
+Очередь исходящих сообщений с учётом лимитов Telegram.
+
+Middleware сессии бота пропускает каждое сообщение через два «ведра
+токенов»: общее на бота (OUTBOUND_GLOBAL_RATE в секунду) и отдельное для
+чата (OUTBOUND_CHAT_RATE в секунду, запас OUTBOUND_CHAT_BURST). Общее ведро
+выдаёт токены сначала ответам пользователям, потом рассылкам: приоритет
+задаётся контекстной переменной, рассылка оборачивается в bulk_priority().
+На 429 (TelegramRetryAfter) чат ставится на паузу на retry_after секунд
+(при рассылке — и общее ведро) и запрос повторяется до OUTBOUND_MAX_RETRIES
+раз.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import monotonic
+from typing import Dict, List, Tuple
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+from bot_core.metrics import (OUTBOUND_QUEUE, OUTBOUND_RETRY_AFTER,
+                              OUTBOUND_SENT, OUTBOUND_WAIT_SECONDS)
+
+# Лимиты Bot API: около 30 сообщений в секунду всего и 1 в секунду на чат
+OUTBOUND_GLOBAL_RATE = float(os.getenv("OUTBOUND_GLOBAL_RATE", "30"))
+OUTBOUND_CHAT_RATE = float(os.getenv("OUTBOUND_CHAT_RATE", "1"))
+OUTBOUND_CHAT_BURST = int(os.getenv("OUTBOUND_CHAT_BURST", "3"))
+OUTBOUND_MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", "3"))
+
+# В режиме нескольких процессов общий лимит делится между обработчиками и
+# супервизором (он рассылает ночную статистику). Лимит на чат не делится:
+# чат всегда обслуживает один процесс.
+_BOT_WORKERS = int(os.getenv("BOT_WORKERS", "1"))
+if _BOT_WORKERS > 1:
+    OUTBOUND_GLOBAL_RATE /= _BOT_WORKERS + 1
+
+INTERACTIVE = 0
+BULK = 1
+_PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+_priority: ContextVar[int] = ContextVar("outbound_priority", default=INTERACTIVE)
+
+# Методы, на которые распространяются лимиты на сообщения
+_LIMITED_PREFIXES = ("Send", "Copy", "Forward", "Edit")
+
+
+@contextmanager
+def bulk_priority():
+    """Сообщения, отправленные внутри блока, уступают ответам пользователям."""
+    token = _priority.set(BULK)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    """Ведро токенов: rate в секунду, не больше capacity про запас."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Забирает токен (возможно, в долг) и возвращает, сколько ждать до его появления."""
+        now = monotonic()
+        self._refill(now)
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.paused_until - now)
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, monotonic() + seconds)
+
+    def idle(self, now: float) -> bool:
+        return self.paused_until <= now and self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+class PriorityBucket:
+    """Общее ведро: свободный токен получает ожидающий с наивысшим приоритетом."""
+
+    def __init__(self, rate: float):
+        self.bucket = TokenBucket(rate, capacity=1)
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+        self._pump = None
+
+    async def acquire(self, priority: int) -> None:
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), future))
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.create_task(self._run())
+        await future
+
+    async def _run(self) -> None:
+        while self._waiters:
+            wait = self.bucket.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            # Пауза после 429 могла начаться, пока ждали токен
+            while (pause := self.bucket.paused_until - monotonic()) > 0:
+                await asyncio.sleep(pause)
+            # Отменённые ожидания не должны тратить токены
+            while self._waiters:
+                _, _, future = heapq.heappop(self._waiters)
+                if not future.done():
+                    future.set_result(None)
+                    break
+
+
+class OutboundLimiter(BaseRequestMiddleware):
+    """Middleware сессии бота: лимиты, приоритеты и повтор после 429."""
+
+    def __init__(
+        self,
+        global_rate: float = OUTBOUND_GLOBAL_RATE,
+        chat_rate: float = OUTBOUND_CHAT_RATE,
+        chat_burst: int = OUTBOUND_CHAT_BURST,
+        max_retries: int = OUTBOUND_MAX_RETRIES,
+    ):
+        self.global_bucket = PriorityBucket(global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.chats: Dict[int, TokenBucket] = {}
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self.chats.get(chat_id)
+        if bucket is None:
+            if len(self.chats) >= 10_000:
+                # Полные вёдра ничего не помнят — их можно забыть
+                now = monotonic()
+                self.chats = {key: b for key, b in self.chats.items() if not b.idle(now)}
+            bucket = self.chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    async def _wait_turn(self, chat_id, priority: int) -> None:
+        label = _PRIORITY_NAMES[priority]
+        started = monotonic()
+        OUTBOUND_QUEUE.labels(label).inc()
+        try:
+            wait = self._chat_bucket(chat_id).reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await self.global_bucket.acquire(priority)
+        finally:
+            OUTBOUND_QUEUE.labels(label).dec()
+            OUTBOUND_WAIT_SECONDS.labels(label).observe(monotonic() - started)
+
+    async def __call__(self, make_request, bot, method):
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None or not type(method).__name__.startswith(_LIMITED_PREFIXES):
+            return await make_request(bot, method)
+
+        priority = _priority.get()
+        for attempt in range(self.max_retries + 1):
+            await self._wait_turn(chat_id, priority)
+            try:
+                result = await make_request(bot, method)
+            except TelegramRetryAfter as error:
+                OUTBOUND_RETRY_AFTER.inc()
+                self._chat_bucket(chat_id).pause(error.retry_after)
+                if priority == BULK:
+                    # 429 во время рассылки — общий flood-лимит бота, ждут все чаты
+                    self.global_bucket.bucket.pause(error.retry_after)
+                if attempt == self.max_retries:
+                    raise
+                continue
+            OUTBOUND_SENT.labels(_PRIORITY_NAMES[priority]).inc()
+            return result
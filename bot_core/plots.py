@@ -1,138 +1,52 @@
-import io
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from typing import Tuple
 
-import matplotlib.pyplot as plt
-import pytz
-from sqlalchemy.future import select
+import numpy as np
 
-from db.database import get_db
-from db.models import FeedingRecord, SleepRecord
+from bot_core.aggregate import daily_table, day_range
+from bot_core.render import (DASHBOARD_SERIES, render_dashboard_png,
+                             render_feeding_png, render_service,
+                             render_sleep_png)
+from db.models import DEFAULT_TZ, DailyRollup
+from db.rollups import rollups_query
 
-TZ = pytz.timezone("Europe/Moscow")
+# Сколько дней назад начинается период; заканчивается он вчера
+PERIOD_START = {"7d": 6, "30d": 29, "all": 89}
 
 
-async def generate_feeding_plot(chat_id: int, period: str = "7d") -> io.BytesIO:
-    """Генерирует график кормлений за указанный период: 7d / 30d / all (90d)."""
-    now = datetime.now(TZ)
-
-    if period == "7d":
-        start_date = now.date() - timedelta(days=6)
-    elif period == "30d":
-        start_date = now.date() - timedelta(days=29)
-    elif period == "all":
-        start_date = now.date() - timedelta(days=89)
-    else:
-        raise ValueError("Неподдерживаемый период")
-
-    end_date = now.date() - timedelta(days=1)
-    days_count = (end_date - start_date).days + 1
-
-    dates = [start_date + timedelta(days=i) for i in range(days_count)]
-    amounts = [0] * days_count
-
-    async for db_session in get_db():
-        result = await db_session.execute(
-            select(FeedingRecord).where(
-                FeedingRecord.chat_id == chat_id,
-                FeedingRecord.timestamp >= start_date,
-            )
-        )
-        records = result.scalars().all()
-
-        for record in records:
-            local_date = record.timestamp.astimezone(TZ).date()
-            index = (local_date - start_date).days
-            if 0 <= index < days_count:
-                amounts[index] += record.amount
-
-    # Рисуем график
-    fig_width = min(20, max(6, days_count / 6))
-    fig, ax = plt.subplots(figsize=(fig_width, 4))
-    ax.plot(dates, amounts, marker="o", color="royalblue", linewidth=2)
-    ax.set_title(f"Кормления за {days_count} дней")
-    ax.set_xlabel("Дата")
-    ax.set_ylabel("мл")
-    ax.grid(True)
-
-    # Добавляем среднюю линию
-    non_zero_values = [a for a in amounts if a > 0]
-    if non_zero_values:
-        avg = sum(non_zero_values) / len(non_zero_values)
-        ax.axhline(y=avg, color="red", linestyle="--", label=f"Среднее: {avg:.1f} мл")
-        ax.legend()
-
-    step = max(1, days_count // 10)
-    ax.set_xticks(dates[::step])
-    ax.set_xticklabels([d.strftime("%d.%m") for d in dates[::step]], rotation=45)
-
-    buffer = io.BytesIO()
-    plt.tight_layout()
-    plt.savefig(buffer, format="png")
-    buffer.seek(0)
-    plt.close(fig)
-
-    return buffer
-
-
-async def generate_sleep_plot(chat_id: int, period: str = "7d") -> io.BytesIO:
-    now = datetime.now(TZ)
-
-    if period == "7d":
-        start_date = now.date() - timedelta(days=6)
-    elif period == "30d":
-        start_date = now.date() - timedelta(days=29)
-    elif period == "all":
-        start_date = now.date() - timedelta(days=89)
-    else:
+def period_range(period: str, tz=DEFAULT_TZ) -> Tuple[date, int]:
+    """Первый день и число дней периода (даты — в часовом поясе tz)."""
+    if period not in PERIOD_START:
         raise ValueError("Неподдерживаемый период")
-
-    end_date = now.date() - timedelta(days=1)
-    days_count = (end_date - start_date).days + 1
-
-    sleep_data = {start_date + timedelta(days=i): 0 for i in range(days_count)}
-
-    async for session in get_db():
-        result = await session.execute(
-            select(SleepRecord).where(
-                SleepRecord.chat_id == chat_id,
-                SleepRecord.end_time.isnot(None),
-                SleepRecord.end_time
-                >= datetime.combine(start_date, datetime.min.time()),
-            )
-        )
-        records = result.scalars().all()
-
-    for record in records:
-        date = record.end_time.astimezone(TZ).date()
-        duration = int((record.end_time - record.start_time).total_seconds() // 60)
-        if date in sleep_data:
-            sleep_data[date] += duration
-
-    dates = list(sleep_data.keys())
-    values = [round(v / 60, 2) for v in sleep_data.values()]
-
-    fig_width = min(20, max(6, days_count / 6))
-    fig, ax = plt.subplots(figsize=(fig_width, 4))
-    ax.bar(dates, values, color="#8ab6d6")
-    ax.set_title(f"Сон за {days_count} дней")
-    ax.set_ylabel("Часы сна")
-    ax.set_xlabel("Дата")
-    ax.grid(True, axis="y")
-
-    non_zero_values = [v for v in values if v > 0]
-    if non_zero_values:
-        avg = sum(non_zero_values) / len(non_zero_values)
-        ax.axhline(y=avg, color="red", linestyle="--", label=f"Среднее: {avg:.1f} ч")
-        ax.legend()
-
-    step = max(1, days_count // 10)
-    ax.set_xticks(dates[::step])
-    ax.set_xticklabels([d.strftime("%d.%m") for d in dates[::step]], rotation=45)
-
-    buffer = io.BytesIO()
-    plt.tight_layout()
-    plt.savefig(buffer, format="png")
-    buffer.seek(0)
-    plt.close(fig)
-
-    return buffer
+    return datetime.now(tz).date() - timedelta(days=PERIOD_START[period]), PERIOD_START[period]
+
+
+# Колонки итогов, из которых строится каждая диаграмма
+PLOT_COLUMNS = {
+    "feeding": (DailyRollup.day_feed_ml + DailyRollup.night_feed_ml,),
+    "sleep": (DailyRollup.day_sleep_min + DailyRollup.night_sleep_min,),
+    "dashboard": tuple(getattr(DailyRollup, name) for name in DASHBOARD_SERIES),
+}
+
+
+async def fetch_plot_data(db_session, chat_id: int, plot_type: str, period: str = "7d",
+                          tz=DEFAULT_TZ) -> Tuple[list, np.ndarray]:
+    """Даты периода и суммы колонок диаграммы по дням: массив (колонки, дни периода)."""
+    columns = PLOT_COLUMNS[plot_type]
+    start_date, days_count = period_range(period, tz)
+    end_date = start_date + timedelta(days=days_count - 1)
+
+    result = await db_session.execute(rollups_query(chat_id, start_date, end_date, *columns))
+    period_days = day_range(start_date, days_count)
+    return period_days.tolist(), daily_table(result.all(), period_days, len(columns))
+
+
+async def render_plot(plot_type: str, dates: list, table: np.ndarray) -> bytes:
+    """PNG диаграммы по данным fetch_plot_data; БД не нужна."""
+    if plot_type == "feeding":
+        return await render_service.render(render_feeding_png, dates, table[0].astype(int).tolist())
+    if plot_type == "sleep":
+        hours = np.round(table[0] / 60, 2)
+        return await render_service.render(render_sleep_png, dates, hours.tolist())
+    series = {name: values.tolist() for name, values in zip(DASHBOARD_SERIES, table)}
+    return await render_service.render(render_dashboard_png, dates, series)
@@ -0,0 +1,197 @@
+"""
+Отладочное профилирование обновлений (включается DEBUG_PROFILE=true).
+
+Для каждого обновления считаются SQL-запросы: контекстная переменная
+хранит трассировку текущего обновления, события движка дописывают в неё
+запросы. Для обновления, обработанного дольше DEBUG_SLOW_MS, в
+DEBUG_PROFILE_DIR пишется .sql.txt со списком запросов и числом повторов,
+а если обновление профилировалось — и профиль: HTML от pyinstrument, если он
+установлен (requirements-dev.txt), иначе .prof от cProfile (python -m pstats
+или snakeviz).
+Запрос, повторённый в одном обновлении DEBUG_REPEATED_QUERY раз и больше,
+помечается как вероятный N+1.
+
+Профилируется доля DEBUG_PROFILE_SAMPLE обновлений и не больше одного
+одновременно: профилировщик в потоке один, и так он не замедляет весь поток
+обновлений. Остальные обновления только считают запросы.
+"""
+import cProfile
+import logging
+import os
+import random
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import lru_cache
+from time import perf_counter
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+DEBUG_PROFILE = os.getenv("DEBUG_PROFILE", "false").lower() == "true"
+DEBUG_PROFILE_DIR = os.getenv("DEBUG_PROFILE_DIR", "profiles")
+DEBUG_SLOW_MS = float(os.getenv("DEBUG_SLOW_MS", "200"))
+DEBUG_REPEATED_QUERY = int(os.getenv("DEBUG_REPEATED_QUERY", "3"))
+# Доля профилируемых обновлений
+DEBUG_PROFILE_SAMPLE = float(os.getenv("DEBUG_PROFILE_SAMPLE", "0.1"))
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class UpdateTrace:
+    queries: Counter = field(default_factory=Counter)
+    db_seconds: float = 0.0
+
+    @property
+    def query_count(self) -> int:
+        return sum(self.queries.values())
+
+    def repeated(self, threshold: int = DEBUG_REPEATED_QUERY) -> Dict[str, int]:
+        return {sql: n for sql, n in self.queries.items() if n >= threshold}
+
+
+_trace: ContextVar[Optional[UpdateTrace]] = ContextVar("update_trace", default=None)
+
+
+def trace_queries(engine: AsyncEngine) -> None:
+    """Дописывает запросы движка в трассировку текущего обновления."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if _trace.get() is not None:
+            conn.info["trace_started"] = perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after(conn, cursor, statement, parameters, context, executemany):
+        trace = _trace.get()
+        if trace is not None:
+            trace.queries[statement] += 1
+            trace.db_seconds += perf_counter() - conn.info.pop("trace_started", perf_counter())
+
+
+@lru_cache(maxsize=None)
+def _pyinstrument_profiler():
+    """Profiler из pyinstrument (requirements-dev.txt) или None — тогда cProfile."""
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        return None
+    return Profiler
+
+
+class _UpdateProfiler:
+    """pyinstrument или cProfile за общим интерфейсом."""
+
+    def __init__(self):
+        profiler_class = _pyinstrument_profiler()
+        self._pyinstrument = profiler_class is not None
+        self._profiler = profiler_class(async_mode="enabled") if self._pyinstrument else cProfile.Profile()
+
+    def start(self) -> None:
+        if self._pyinstrument:
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+
+    def stop(self) -> None:
+        if self._pyinstrument:
+            self._profiler.stop()
+        else:
+            self._profiler.disable()
+
+    def save(self, path_without_suffix: str) -> str:
+        if self._pyinstrument:
+            path = path_without_suffix + ".html"
+            with open(path, "w", encoding="utf-8") as file:
+                file.write(self._profiler.output_html())
+        else:
+            path = path_without_suffix + ".prof"
+            self._profiler.dump_stats(path)
+        return path
+
+
+class ProfilingMiddleware(BaseMiddleware):
+    """Внешний middleware dp.update: счётчик SQL и профиль медленных обновлений."""
+
+    def __init__(
+        self,
+        output_dir: str = DEBUG_PROFILE_DIR,
+        slow_ms: float = DEBUG_SLOW_MS,
+        repeated_threshold: int = DEBUG_REPEATED_QUERY,
+        sample: float = DEBUG_PROFILE_SAMPLE,
+    ):
+        self.output_dir = output_dir
+        self.slow_ms = slow_ms
+        self.repeated_threshold = repeated_threshold
+        self.sample = sample
+        self._profiling = False
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        trace = UpdateTrace()
+        token = _trace.set(trace)
+        profiler = None
+        if not self._profiling and random.random() < self.sample:
+            self._profiling = True
+            profiler = _UpdateProfiler()
+            profiler.start()
+        started = perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            elapsed_ms = (perf_counter() - started) * 1000
+            if profiler is not None:
+                profiler.stop()
+                self._profiling = False
+            _trace.reset(token)
+            self._report(event, trace, elapsed_ms, profiler)
+
+    def _report(self, update: Update, trace: UpdateTrace, elapsed_ms: float,
+                profiler: Optional[_UpdateProfiler]) -> None:
+        logger.debug(
+            "Обновление %s: %.1f мс, SQL-запросов %d (%.1f мс)",
+            update.update_id, elapsed_ms, trace.query_count, trace.db_seconds * 1000,
+        )
+        for statement, times in trace.repeated(self.repeated_threshold).items():
+            logger.warning(
+                "Обновление %s: запрос выполнен %d раз (N+1?): %s",
+                update.update_id, times, " ".join(statement.split())[:300],
+            )
+        if elapsed_ms < self.slow_ms:
+            return
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        name = f"{datetime.now():%Y%m%d-%H%M%S}_{update.update_id}_{elapsed_ms:.0f}ms"
+        base = os.path.join(self.output_dir, name)
+        path = self._save_queries(base, update, trace, elapsed_ms)
+        if profiler is not None:
+            path += ", " + profiler.save(base)
+        logger.warning(
+            "Медленное обновление %s (%s): %.1f мс, SQL-запросов %d (%.1f мс), файлы: %s",
+            update.update_id, update.event_type, elapsed_ms, trace.query_count,
+            trace.db_seconds * 1000, path,
+        )
+
+    def _save_queries(self, path_without_suffix: str, update: Update, trace: UpdateTrace,
+                      elapsed_ms: float) -> str:
+        """Список SQL-запросов обновления с числом повторов, частые — первыми."""
+        path = path_without_suffix + ".sql.txt"
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(
+                f"-- Обновление {update.update_id} ({update.event_type}): {elapsed_ms:.1f} мс, "
+                f"SQL-запросов {trace.query_count} ({trace.db_seconds * 1000:.1f} мс)\n"
+            )
+            for statement, times in trace.queries.most_common():
+                mark = " (N+1?)" if times >= self.repeated_threshold else ""
+                file.write(f"\n-- {times} раз{mark}\n{statement.strip()};\n")
+        return path
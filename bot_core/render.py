@@ -0,0 +1,299 @@
+import asyncio
+import io
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from time import perf_counter
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from bot_core.metrics import RENDER_PNG_BYTES, RENDER_SECONDS
+
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "2"))
+# Сколько графиков может одновременно ждать отрисовки (включая рисуемые)
+RENDER_QUEUE_LIMIT = int(os.getenv("RENDER_QUEUE_LIMIT", "16"))
+# Приоритет процессов отрисовки ниже, чем у цикла событий бота
+RENDER_NICE = int(os.getenv("RENDER_NICE", "5"))
+
+
+class RenderQueueFull(Exception):
+    """Очередь отрисовки переполнена."""
+
+
+def _init_worker() -> None:
+    if RENDER_NICE and hasattr(os, "nice"):
+        os.nice(RENDER_NICE)
+
+
+class _FigureTemplate:
+    """
+    Figure с холстом Agg и буфером PNG, переиспользуемые между отрисовками.
+
+    Используется Figure напрямую, без глобального состояния pyplot.
+    matplotlib импортируется здесь, в процессе отрисовки: основному
+    процессу бота он не нужен.
+    """
+
+    def __init__(self, figsize: Tuple[float, float]):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        self.figure = Figure(figsize=figsize)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.buffer = io.BytesIO()
+
+    def _png(self) -> bytes:
+        self.figure.tight_layout()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        self.canvas.print_png(self.buffer)
+        return self.buffer.getvalue()
+
+
+class ChartTemplate(_FigureTemplate):
+    """
+    Готовая фигура для графиков одного вида и размера.
+
+    Оси, подписи и сетка создаются один раз; при отрисовке меняются только
+    данные линии или высоты столбцов, подписи дат и средняя линия.
+    """
+
+    def __init__(self, kind: str, days_count: int):
+        super().__init__((_figure_width(days_count), 4))
+        style = CHART_STYLES[kind]
+        self.unit = style["unit"]
+
+        ax = self.ax = self.figure.add_subplot()
+        positions = range(days_count)
+        if kind == "feeding":
+            (self.line,) = ax.plot(positions, [0] * days_count, marker="o", color="royalblue", linewidth=2)
+            self.bars = None
+            ax.grid(True)
+        else:
+            self.line = None
+            self.bars = ax.bar(positions, [0] * days_count, color="#8ab6d6")
+            ax.grid(True, axis="y")
+        ax.set_title(style["title"].format(days=days_count))
+        ax.set_xlabel("Дата")
+        ax.set_ylabel(style["ylabel"])
+
+        self.step = max(1, days_count // 10)
+        ax.set_xticks(positions[::self.step])
+        self.average = ax.axhline(y=0, color="red", linestyle="--", label=" ")
+        self.legend = ax.legend()
+
+    def render(self, dates: List[date], values: List[float]) -> bytes:
+        ax = self.ax
+        if self.line is not None:
+            self.line.set_ydata(values)
+        else:
+            for bar, value in zip(self.bars, values):
+                bar.set_height(value)
+
+        non_zero_values = [v for v in values if v > 0]
+        if non_zero_values:
+            avg = sum(non_zero_values) / len(non_zero_values)
+            self.average.set_ydata([avg, avg])
+            self.legend.get_texts()[0].set_text(f"Среднее: {avg:.1f} {self.unit}")
+        self.average.set_visible(bool(non_zero_values))
+        self.legend.set_visible(bool(non_zero_values))
+
+        ax.set_xticklabels([d.strftime("%d.%m") for d in dates[::self.step]], rotation=45)
+        ax.relim(visible_only=True)
+        ax.autoscale_view()
+        return self._png()
+
+
+# Колонки daily_rollups, из которых строится сводка, в порядке передачи
+DASHBOARD_SERIES = (
+    "day_feed_ml",
+    "night_feed_ml",
+    "day_sleep_min",
+    "night_sleep_min",
+    "feed_count",
+    "sleep_count",
+)
+
+
+class DashboardTemplate(_FigureTemplate):
+    """Сводка 2×2: питание и сон (день/ночь), число кормлений и снов по дням."""
+
+    def __init__(self, days_count: int):
+        from matplotlib.ticker import MaxNLocator
+
+        super().__init__((max(10, _figure_width(days_count)), 7))
+        (feed_ax, sleep_ax), (feed_count_ax, sleep_count_ax) = self.axes = self.figure.subplots(
+            2, 2, sharex=True
+        )
+        positions = range(days_count)
+        zeros = [0] * days_count
+
+        self.feed_bars = (
+            feed_ax.bar(positions, zeros, color="royalblue", label="День"),
+            feed_ax.bar(positions, zeros, color="#1b2a6b", label="Ночь"),
+        )
+        self.sleep_bars = (
+            sleep_ax.bar(positions, zeros, color="#8ab6d6", label="День"),
+            sleep_ax.bar(positions, zeros, color="#2e5e86", label="Ночь"),
+        )
+        (self.feed_count_line,) = feed_count_ax.plot(positions, zeros, marker="o", color="royalblue")
+        (self.sleep_count_line,) = sleep_count_ax.plot(positions, zeros, marker="o", color="#2e5e86")
+
+        for ax, title in (
+            (feed_ax, "Питание, мл"),
+            (sleep_ax, "Сон, ч"),
+            (feed_count_ax, "Кормлений в день"),
+            (sleep_count_ax, "Снов в день"),
+        ):
+            ax.set_title(title)
+            ax.grid(True, axis="y")
+        for ax in (feed_count_ax, sleep_count_ax):
+            ax.yaxis.set_major_locator(MaxNLocator(integer=True))
+        feed_ax.legend(loc="upper left")
+        sleep_ax.legend(loc="upper left")
+        self.figure.suptitle(f"Сводка за {days_count} дней")
+
+        self.step = max(1, days_count // 10)
+        feed_count_ax.set_xticks(positions[::self.step])
+
+    @staticmethod
+    def _stack(bars, day: List[float], night: List[float]) -> None:
+        for day_bar, night_bar, day_value, night_value in zip(*bars, day, night):
+            day_bar.set_height(day_value)
+            night_bar.set_y(day_value)
+            night_bar.set_height(night_value)
+
+    def render(self, dates: List[date], series: Dict[str, List[float]]) -> bytes:
+        self._stack(self.feed_bars, series["day_feed_ml"], series["night_feed_ml"])
+        self._stack(
+            self.sleep_bars,
+            [minutes / 60 for minutes in series["day_sleep_min"]],
+            [minutes / 60 for minutes in series["night_sleep_min"]],
+        )
+        self.feed_count_line.set_ydata(series["feed_count"])
+        self.sleep_count_line.set_ydata(series["sleep_count"])
+
+        labels = [d.strftime("%d.%m") for d in dates[::self.step]]
+        for ax in self.axes[1]:
+            ax.set_xticklabels(labels, rotation=45)
+        for ax in self.axes.flat:
+            ax.relim()
+            ax.autoscale_view()
+            # Все значения неотрицательны; пустой период — шкала 0…1, а не ±0.05
+            ax.set_ylim(0, max(ax.get_ylim()[1], 1))
+        return self._png()
+
+
+CHART_STYLES = {
+    "feeding": {"title": "Кормления за {days} дней", "ylabel": "мл", "unit": "мл"},
+    "sleep": {"title": "Сон за {days} дней", "ylabel": "Часы сна", "unit": "ч"},
+}
+
+# Шаблоны процесса отрисовки: (вид, число дней) -> шаблон
+_templates: Dict[Tuple[str, int], _FigureTemplate] = {}
+
+
+def _template(kind: str, days_count: int) -> _FigureTemplate:
+    key = (kind, days_count)
+    if key not in _templates:
+        if kind == "dashboard":
+            _templates[key] = DashboardTemplate(days_count)
+        else:
+            _templates[key] = ChartTemplate(kind, days_count)
+    return _templates[key]
+
+
+def warm_up(sizes: Iterable[int] = ()) -> None:
+    """Загружает matplotlib, шрифты и шаблоны для sizes в процессе отрисовки заранее."""
+    for days_count in sizes:
+        dates, zeros = [date.today()] * days_count, [0] * days_count
+        for kind in CHART_STYLES:
+            _template(kind, days_count).render(dates, zeros)
+        _template("dashboard", days_count).render(dates, dict.fromkeys(DASHBOARD_SERIES, zeros))
+    if not sizes:
+        ChartTemplate("feeding", 1).render([date.today()], [0])
+
+
+def _figure_width(days_count: int) -> float:
+    return min(20, max(6, days_count / 6))
+
+
+def render_feeding_png(dates: List[date], amounts: List[int]) -> bytes:
+    """Рисует график кормлений (мл по дням)."""
+    return _template("feeding", len(dates)).render(dates, amounts)
+
+
+def render_sleep_png(dates: List[date], hours: List[float]) -> bytes:
+    """Рисует график сна (часы по дням)."""
+    return _template("sleep", len(dates)).render(dates, hours)
+
+
+def render_dashboard_png(dates: List[date], series: Dict[str, List[float]]) -> bytes:
+    """Рисует сводку за период; series — значения DASHBOARD_SERIES по дням."""
+    return _template("dashboard", len(dates)).render(dates, series)
+
+
+class RenderService:
+    """
+    Отрисовка графиков в пуле процессов, чтобы matplotlib не блокировал
+    цикл событий бота.
+
+    Одновременно в пул передаётся не больше workers задач, остальные ждут
+    своей очереди; если ожидающих больше queue_limit, новый запрос сразу
+    отклоняется с RenderQueueFull.
+    """
+
+    def __init__(self, workers: int = RENDER_WORKERS, queue_limit: int = RENDER_QUEUE_LIMIT):
+        self._workers = workers
+        self._queue_limit = queue_limit
+        self._executor = None
+        self._slots = None
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _ensure_executor(self) -> None:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self._workers, initializer=_init_worker
+            )
+            self._slots = asyncio.Semaphore(self._workers)
+
+    async def prewarm(self, sizes: Iterable[int] = ()) -> None:
+        """Запускает процессы отрисовки и готовит в них шаблоны графиков в фоне."""
+        self._ensure_executor()
+        loop = asyncio.get_running_loop()
+        sizes = tuple(sizes)
+        try:
+            await asyncio.gather(
+                *(loop.run_in_executor(self._executor, warm_up, sizes) for _ in range(self._workers))
+            )
+        except Exception:
+            logging.exception("Не удалось прогреть процессы отрисовки")
+
+    async def render(self, func: Callable[..., bytes], *args) -> bytes:
+        if self._pending >= self._queue_limit:
+            raise RenderQueueFull()
+        self._ensure_executor()
+
+        self._pending += 1
+        try:
+            async with self._slots:
+                loop = asyncio.get_running_loop()
+                started = perf_counter()
+                png = await loop.run_in_executor(self._executor, func, *args)
+                RENDER_SECONDS.labels(func.__name__).observe(perf_counter() - started)
+                RENDER_PNG_BYTES.labels(func.__name__).observe(len(png))
+                return png
+        finally:
+            self._pending -= 1
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+render_service = RenderService()
@@ -1,109 +1,275 @@
-from datetime import datetime, time, timedelta
+import asyncio
+import logging
+import os
+import zlib
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from time import perf_counter
+from typing import Dict, List, Optional, Sequence
 
 import aiocron
 import pytz
-from sqlalchemy import func, select
+from sqlalchemy import (DateTime, Integer, cast, literal, null, select,
+                        union_all)
+from sqlalchemy.dialects.postgresql import insert
 
 from bot_core.bot_instance import bot
+from bot_core.metrics import NIGHTLY_FAILURES, NIGHTLY_SECONDS
+from bot_core.outbound import bulk_priority
 from bot_core.utils import format_minutes
-from db.database import get_db
-from db.models import FeedingRecord, SleepRecord, User
+from db.database import get_db, release_connection
+from db.intervals import SleepSweep
+from db.models import DEFAULT_TZ, BotState, DailyRollup, SleepRecord, User
 
-TZ = pytz.timezone("Europe/Moscow")
 
+def _statistics_query(chat_ids: Sequence[int], start_date: date, end_date: date):
+    """
+    Один запрос со всей статистикой за период для группы пользователей.
 
-async def build_statistics_text(chat_id: int) -> str:
-    today = datetime.now(TZ).date()
-    days = [today - timedelta(days=i) for i in range(3)]
+    Возвращает строки двух видов (kind):
+      totals — суточные итоги питания и сна из daily_rollups;
+      sleep  — завершённые сны, закончившиеся за период или на следующий
+               день (по ним находится бодрствование, в том числе через полночь).
+    Даты — местные даты пользователей (local_day), обе части читаются по
+    диапазону индексов (chat_id, дата). Сны идут в порядке начала.
+    """
+    no_time = cast(null(), DateTime(timezone=True))
+    no_total = cast(null(), Integer)
+    totals = select(
+        literal("totals").label("kind"),
+        DailyRollup.chat_id,
+        DailyRollup.local_date.label("day"),
+        DailyRollup.day_feed_ml,
+        DailyRollup.night_feed_ml,
+        DailyRollup.day_sleep_min,
+        DailyRollup.night_sleep_min,
+        no_time.label("start_time"),
+        no_time.label("end_time"),
+    ).where(
+        DailyRollup.chat_id.in_(chat_ids),
+        DailyRollup.local_date.between(start_date, end_date),
+    )
 
-    day_blocks = []
+    # Бодрствование последнего дня заканчивается сном, который может
+    # закончиться уже на следующий день
+    sleeps = select(
+        literal("sleep").label("kind"),
+        SleepRecord.chat_id,
+        SleepRecord.local_day.label("day"),
+        no_total.label("day_feed_ml"),
+        no_total.label("night_feed_ml"),
+        no_total.label("day_sleep_min"),
+        no_total.label("night_sleep_min"),
+        SleepRecord.start_time,
+        SleepRecord.end_time,
+    ).where(
+        SleepRecord.chat_id.in_(chat_ids),
+        SleepRecord.local_day.between(start_date, end_date + timedelta(days=1)),
+    )
 
-    async for db_session in get_db():
-        for day in days:
-            day_start = datetime.combine(day, time(6, 0)).astimezone(TZ)
-            day_end = datetime.combine(day, time(22, 0)).astimezone(TZ)
-
-            # === Питание за день ===
-            feeds_result = await db_session.execute(
-                select(FeedingRecord).where(
-                    FeedingRecord.chat_id == chat_id,
-                    func.date(FeedingRecord.timestamp) == day,
-                )
-            )
-            feeds = feeds_result.scalars().all()
-            day_feed = sum(
-                f.amount
-                for f in feeds
-                if day_start <= f.timestamp.astimezone(TZ) <= day_end
-            )
-            night_feed = sum(
-                f.amount
-                for f in feeds
-                if not (day_start <= f.timestamp.astimezone(TZ) <= day_end)
-            )
+    return union_all(totals, sleeps).order_by("chat_id", "start_time")
 
-            # === Сон за день ===
-            sleeps_result = await db_session.execute(
-                select(SleepRecord).where(
-                    SleepRecord.chat_id == chat_id,
-                    SleepRecord.end_time.isnot(None),
-                    func.date(SleepRecord.end_time) == day,
-                )
-            )
-            sleeps = sleeps_result.scalars().all()
-            wake_blocks = []
-            # Сортируем сны по времени
-            sleeps_sorted = sorted(sleeps, key=lambda s: s.end_time)
-
-            # Находим промежутки бодрствования
-            for i in range(1, len(sleeps_sorted)):
-                prev_sleep = sleeps_sorted[i - 1]
-                curr_sleep = sleeps_sorted[i]
-
-                wake_start = prev_sleep.end_time
-                wake_end = curr_sleep.start_time
-
-                if wake_end > wake_start:  # Проверим ва
-                    duration_min = int((wake_end - wake_start).total_seconds() // 60)
-                    wake_blocks.append(
-                        f"🕓 {wake_start.astimezone(TZ).strftime('%H:%M')} — {wake_end.astimezone(TZ).strftime('%H:%M')} ({format_minutes(duration_min)})"
-                    )
 
-            day_sleep = night_sleep = 0
-            for s in sleeps:
-                end_msk = s.end_time.astimezone(TZ)
-                duration = int((s.end_time - s.start_time).total_seconds() // 60)
-                if day_start <= end_msk <= day_end:
-                    day_sleep += duration
-                else:
-                    night_sleep += duration
-
-            block = (
-                f"📅 <b>{day.strftime('%d.%m.%Y')}</b>\n"
-                f"🥛 Питание: День — {day_feed} мл, Ночь — {night_feed} мл\n"
-                f"😴 Сон: День — {format_minutes(day_sleep)}, Ночь — {format_minutes(night_sleep)}\n"
-                + (f"⏰ Бодрствование:\n" + "\n".join(wake_blocks) + "\n" if wake_blocks else "")
+@dataclass
+class DayStats:
+    day_feed: int = 0
+    night_feed: int = 0
+    day_sleep: int = 0
+    night_sleep: int = 0
+    wakes: list = field(default_factory=list)
+    overlaps: list = field(default_factory=list)
+
+
+def statistics_days(tz=DEFAULT_TZ) -> List[date]:
+    """Дни отчёта: сегодня и два предыдущих (в часовом поясе tz), от новых к старым."""
+    today = datetime.now(tz).date()
+    return [today - timedelta(days=i) for i in range(3)]
+
+
+async def fetch_statistics(
+    db_session, chat_ids: Sequence[int], days: List[date], tz=DEFAULT_TZ
+) -> Dict[int, Dict[date, DayStats]]:
+    """Статистика по дням для группы пользователей (часовой пояс tz) за один запрос."""
+    stats = {chat_id: {day: DayStats() for day in days} for chat_id in chat_ids}
+    sweeps: Dict[int, SleepSweep] = {}
+    result = await db_session.execute(_statistics_query(chat_ids, days[-1], days[0]))
+    for row in result:
+        if row.kind == "sleep":
+            if row.chat_id not in sweeps:
+                sweeps[row.chat_id] = SleepSweep(tz)
+            sweeps[row.chat_id].add(row.start_time, row.end_time)
+            continue
+        day_stats = stats[row.chat_id].get(row.day)
+        if day_stats is not None:
+            day_stats.day_feed = row.day_feed_ml
+            day_stats.night_feed = row.night_feed_ml
+            day_stats.day_sleep = row.day_sleep_min
+            day_stats.night_sleep = row.night_sleep_min
+
+    # Бодрствование и пересечения относятся ко дню, в который начались
+    for chat_id, sweep in sweeps.items():
+        for name, intervals in (("wakes", sweep.wakes), ("overlaps", sweep.overlaps)):
+            for start, end in intervals:
+                day_stats = stats[chat_id].get(start.astimezone(tz).date())
+                if day_stats is not None:
+                    getattr(day_stats, name).append((start, end))
+    return stats
+
+
+def render_statistics_text(stats: Dict[date, DayStats], tz=DEFAULT_TZ) -> str:
+    day_blocks = []
+    for day, day_stats in stats.items():
+        # Находим промежутки бодрствования
+        wake_blocks = []
+        for wake_start, wake_end in day_stats.wakes:
+            duration_min = int((wake_end - wake_start).total_seconds() // 60)
+            wake_blocks.append(
+                f"🕓 {wake_start.astimezone(tz).strftime('%H:%M')} — {wake_end.astimezone(tz).strftime('%H:%M')} ({format_minutes(duration_min)})"
             )
-            day_blocks.append(block)
+
+        overlap_blocks = [
+            f"🕓 {start.astimezone(tz).strftime('%H:%M')} — {end.astimezone(tz).strftime('%H:%M')}"
+            for start, end in day_stats.overlaps
+        ]
+
+        block = (
+            f"📅 <b>{day.strftime('%d.%m.%Y')}</b>\n"
+            f"🥛 Питание: День — {day_stats.day_feed} мл, Ночь — {day_stats.night_feed} мл\n"
+            f"😴 Сон: День — {format_minutes(day_stats.day_sleep)}, Ночь — {format_minutes(day_stats.night_sleep)}\n"
+            + (f"⏰ Бодрствование:\n" + "\n".join(wake_blocks) + "\n" if wake_blocks else "")
+            + (f"⚠️ Сны пересекаются:\n" + "\n".join(overlap_blocks) + "\n" if overlap_blocks else "")
+        )
+        day_blocks.append(block)
 
     return "📊 <b>Статистика за последние 3 дня:</b>\n\n" + "\n".join(day_blocks)
 
 
-async def send_daily_statistics(chat_id: int):
-    text = await build_statistics_text(chat_id)
-    await bot.send_message(chat_id=chat_id, text=text, parse_mode="HTML")
+async def build_statistics_text(db_session, chat_id: int, tz=DEFAULT_TZ) -> str:
+    stats = await fetch_statistics(db_session, [chat_id], statistics_days(tz), tz)
+    return render_statistics_text(stats[chat_id], tz)
 
 
-async def send_statistics_to_all_users():
-    """Функция для отправки статистики всем пользователям."""
-    async for session in get_db():
-        users = await session.execute(select(User.chat_id))
-        chat_ids = [user[0] for user in users.fetchall()]  # Получаем список ID
+# Сколько пользователей обрабатывается одним запросом к БД
+NIGHTLY_BATCH_SIZE = int(os.getenv("NIGHTLY_BATCH_SIZE", "500"))
+# Сколько сообщений отправляется одновременно
+NIGHTLY_SEND_CONCURRENCY = int(os.getenv("NIGHTLY_SEND_CONCURRENCY", "20"))
+# Строки bot_state, которыми экземпляры бота делят ночную рассылку
+NIGHTLY_DESTINY = "nightly"
 
-    for chat_id in chat_ids:
-        # Отправляем статистику каждому пользователю
-        await send_daily_statistics(chat_id)
+
+@dataclass
+class NightlyReport:
+    users: int = 0
+    failures: int = 0
+    duration: float = 0.0
+
+
+async def send_statistics_to_all_users(timezones: Optional[Sequence[str]] = None) -> NightlyReport:
+    """Отправляет статистику всем пользователям (или только с часовыми поясами timezones)."""
+    started = perf_counter()
+    report = NightlyReport()
+    slots = asyncio.Semaphore(NIGHTLY_SEND_CONCURRENCY)
+
+    async def send(chat_id: int, text: str) -> bool:
+        async with slots:
+            try:
+                await bot.send_message(chat_id=chat_id, text=text, parse_mode="HTML")
+                return True
+            except Exception:
+                logging.exception("Не удалось отправить статистику в чат %s", chat_id)
+                return False
+
+    # Рассылка уступает очередь ответам пользователям
+    with bulk_priority():
+        async for session in get_db():
+            query = select(User.chat_id, User.timezone)
+            if timezones is not None:
+                query = query.where(User.timezone.in_(timezones))
+            # У пользователей одного часового пояса общие дни отчёта
+            chat_ids_by_zone: Dict[str, List[int]] = {}
+            for chat_id, zone in await session.execute(query):
+                chat_ids_by_zone.setdefault(zone, []).append(chat_id)
+            await release_connection(session)
+
+            for zone, chat_ids in chat_ids_by_zone.items():
+                try:
+                    tz = pytz.timezone(zone)
+                except pytz.UnknownTimeZoneError:
+                    logging.error("Неизвестный часовой пояс %r у %d пользователей", zone, len(chat_ids))
+                    continue
+                days = statistics_days(tz)
+                for offset in range(0, len(chat_ids), NIGHTLY_BATCH_SIZE):
+                    batch = chat_ids[offset:offset + NIGHTLY_BATCH_SIZE]
+                    stats = await fetch_statistics(session, batch, days, tz)
+                    await release_connection(session)
+                    results = await asyncio.gather(
+                        *(send(chat_id, render_statistics_text(stats[chat_id], tz)) for chat_id in batch)
+                    )
+                    report.users += len(batch)
+                    report.failures += results.count(False)
+
+    report.duration = perf_counter() - started
+    NIGHTLY_SECONDS.set(report.duration)
+    NIGHTLY_FAILURES.inc(report.failures)
+    logging.info(
+        "Ночная статистика: пользователей %d, ошибок %d, %.2f с",
+        report.users, report.failures, report.duration,
+    )
+    return report
+
+
+def _is_evening(zone: str, now: datetime) -> bool:
+    try:
+        local = now.astimezone(pytz.timezone(zone))
+    except pytz.UnknownTimeZoneError:
+        logging.error("Неизвестный часовой пояс %r: ночная статистика не отправлена", zone)
+        return False
+    return (local.hour, local.minute) == (23, 59)
+
+
+async def claim_nightly(session, zones: Sequence[str], now: datetime) -> List[str]:
+    """
+    Пояса, рассылку по которым взял этот экземпляр бота.
+
+    Cron срабатывает в каждом экземпляре; за пояс и местную дату отвечает
+    тот, кто первым вставил строку в bot_state.
+    """
+    claimed = []
+    for zone in zones:
+        local_day = now.astimezone(pytz.timezone(zone)).date()
+        result = await session.execute(
+            insert(BotState)
+            .values(
+                bot_id=bot.id,
+                chat_id=int(local_day.strftime("%Y%m%d")),
+                user_id=zlib.crc32(zone.encode()),
+                destiny=NIGHTLY_DESTINY,
+                expires_at=now + timedelta(days=2),
+            )
+            .on_conflict_do_nothing()
+        )
+        if result.rowcount:
+            claimed.append(zone)
+    await session.commit()
+    return claimed
+
+
+async def send_nightly_statistics() -> Optional[NightlyReport]:
+    """Рассылка тем пользователям, у которых сейчас 23:59 по местному времени."""
+    now = datetime.now(pytz.utc)
+    async for session in get_db():
+        zones = (await session.scalars(select(User.timezone).distinct())).all()
+        evening = [zone for zone in zones if _is_evening(zone, now)]
+        evening = await claim_nightly(session, evening, now)
+    if not evening:
+        return None
+    return await send_statistics_to_all_users(evening)
 
 
-# Установим cron-задачу на 23:59 по Москве
-aiocron.crontab("59 23 * * *", func=send_statistics_to_all_users, tz=TZ)
+def schedule_nightly_statistics() -> aiocron.Cron:
+    """
+    Ставит cron-задачу на hh:14, hh:29, hh:44 и hh:59 UTC: в один из этих
+    моментов 23:59 наступает в любом поясе, включая сдвиги на 30 и 45 минут.
+    При нескольких экземплярах бота пояс рассылает один.
+    """
+    return aiocron.crontab("14,29,44,59 * * * *", func=send_nightly_statistics, tz=pytz.utc)
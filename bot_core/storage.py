@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Mapping, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from sqlalchemy import and_, delete, or_, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.future import select
+
+from db.models import BotState
+
+# Через сколько секунд без изменений состояние диалога забывается
+FSM_TTL = int(os.getenv("FSM_TTL", str(24 * 60 * 60)))
+FSM_CLEANUP_INTERVAL = int(os.getenv("FSM_CLEANUP_INTERVAL", "600"))
+FSM_CLEANUP_BATCH = int(os.getenv("FSM_CLEANUP_BATCH", "1000"))
+
+
+class PostgresStorage(BaseStorage):
+    """
+    Хранилище FSM в таблице bot_state.
+
+    Одна строка на ключ (bot_id, chat_id, user_id, destiny); каждая запись
+    продлевает срок жизни строки на ttl секунд. Просроченные и опустевшие
+    строки удаляются пачками в cleanup(). thread_id и business_connection_id
+    не хранятся: бот работает только в личных чатах.
+    """
+
+    def __init__(self, engine: AsyncEngine, ttl: int = FSM_TTL):
+        self.engine = engine
+        self.ttl = timedelta(seconds=ttl)
+
+    @staticmethod
+    def _where(key: StorageKey):
+        return and_(
+            BotState.bot_id == key.bot_id,
+            BotState.chat_id == key.chat_id,
+            BotState.user_id == key.user_id,
+            BotState.destiny == key.destiny,
+        )
+
+    async def _upsert(self, key: StorageKey, **values) -> None:
+        values["expires_at"] = datetime.now(timezone.utc) + self.ttl
+        stmt = insert(BotState).values(
+            bot_id=key.bot_id,
+            chat_id=key.chat_id,
+            user_id=key.user_id,
+            destiny=key.destiny,
+            **values,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[
+                BotState.bot_id,
+                BotState.chat_id,
+                BotState.user_id,
+                BotState.destiny,
+            ],
+            set_={name: getattr(stmt.excluded, name) for name in values},
+        )
+        async with self.engine.begin() as conn:
+            await conn.execute(stmt)
+
+    async def _get(self, key: StorageKey, column) -> Any:
+        async with self.engine.connect() as conn:
+            return await conn.scalar(
+                select(column).where(
+                    self._where(key),
+                    BotState.expires_at > datetime.now(timezone.utc),
+                )
+            )
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self._upsert(key, state=state.state if isinstance(state, State) else state)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return await self._get(key, BotState.state)
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        await self._upsert(key, data=dict(data) or None)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return dict(await self._get(key, BotState.data) or {})
+
+    async def cleanup(self, batch_size: int = FSM_CLEANUP_BATCH) -> int:
+        """Удаляет просроченные и пустые строки пачками по batch_size."""
+        stale = or_(
+            BotState.expires_at <= datetime.now(timezone.utc),
+            and_(BotState.state.is_(None), BotState.data.is_(None)),
+        )
+        primary_key = (BotState.bot_id, BotState.chat_id, BotState.user_id, BotState.destiny)
+        removed = 0
+        while True:
+            batch = select(*primary_key).where(stale).limit(batch_size)
+            async with self.engine.begin() as conn:
+                result = await conn.execute(
+                    delete(BotState).where(tuple_(*primary_key).in_(batch))
+                )
+            removed += result.rowcount
+            if result.rowcount < batch_size:
+                return removed
+
+    async def run_cleanup(self, interval: int = FSM_CLEANUP_INTERVAL) -> None:
+        """Фоновая задача периодической очистки."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                removed = await self.cleanup()
+                if removed:
+                    logging.info("Удалено устаревших состояний FSM: %d", removed)
+            except Exception:
+                logging.exception("Ошибка очистки состояний FSM")
+
+    async def close(self) -> None:
+        # Движок общий с остальным приложением и закрывается вместе с ним
+        pass
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager, nullcontext
+from typing import Any, Callable, Dict, Optional, Set
+
+import uvicorn
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from fastapi import FastAPI, Header, HTTPException, Request, Response
+
+from bot_core.metrics import render_metrics
+
+# Публичный адрес сервиса, например https://telegram-bot.onrender.com
+# (на Render подставляется автоматически)
+WEBHOOK_URL = os.getenv("WEBHOOK_URL") or os.getenv("RENDER_EXTERNAL_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+# Telegram присылает его в заголовке X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+PORT = int(os.getenv("PORT", "8000"))
+
+
+def _log_failure(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logging.error("Ошибка обработки обновления", exc_info=task.exception())
+
+
+def add_status_routes(app: FastAPI) -> FastAPI:
+    """/health для проверки живости и /metrics для Prometheus."""
+
+    @app.get("/health")
+    async def health():
+        return {"ok": True}
+
+    @app.get("/metrics")
+    async def metrics():
+        body, content_type = render_metrics()
+        return Response(content=body, media_type=content_type)
+
+    return app
+
+
+def create_app(
+    dp: Dispatcher,
+    bot: Bot,
+    dispatch: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> FastAPI:
+    """
+    FastAPI-приложение, принимающее обновления Telegram.
+
+    Если задан dispatch, обновление в виде JSON передаётся ему вместо
+    обработки в этом процессе (режим нескольких процессов, см. workers.py).
+    """
+    in_flight: Set[asyncio.Task] = set()
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        await bot.set_webhook(
+            WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET or None,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+        logging.info("Webhook установлен: %s%s", WEBHOOK_URL, WEBHOOK_PATH)
+        yield
+        # Даём дообработаться уже принятым обновлениям
+        if in_flight:
+            await asyncio.wait(in_flight, timeout=10)
+        await bot.session.close()
+
+    app = FastAPI(lifespan=lifespan)
+
+    @app.post(WEBHOOK_PATH)
+    async def receive_update(
+        request: Request,
+        x_telegram_bot_api_secret_token: Optional[str] = Header(default=None),
+    ):
+        if WEBHOOK_SECRET and x_telegram_bot_api_secret_token != WEBHOOK_SECRET:
+            raise HTTPException(status_code=403)
+
+        raw = await request.json()
+        if dispatch is not None:
+            dispatch(raw)
+            return {"ok": True}
+
+        update = Update.model_validate(raw, context={"bot": bot})
+        # Отвечаем Telegram сразу, обработка идёт в фоне
+        task = asyncio.create_task(dp.feed_update(bot, update))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+        task.add_done_callback(_log_failure)
+        return {"ok": True}
+
+    return add_status_routes(app)
+
+
+async def run_webhook(
+    dp: Dispatcher,
+    bot: Bot,
+    dispatch: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> None:
+    """Запускает приём обновлений через webhook на порту PORT."""
+    if not WEBHOOK_URL:
+        raise ValueError("WEBHOOK_URL не задан")
+
+    config = uvicorn.Config(create_app(dp, bot, dispatch), host="0.0.0.0", port=PORT)
+    await uvicorn.Server(config).serve()
+
+
+async def run_status_server() -> None:
+    """В режиме polling отдаёт /health и /metrics на порту PORT."""
+    config = uvicorn.Config(
+        add_status_routes(FastAPI()), host="0.0.0.0", port=PORT, lifespan="off"
+    )
+    server = uvicorn.Server(config)
+    # Сигналы обрабатывает aiogram, а не uvicorn
+    server.capture_signals = nullcontext
+    await server.serve()
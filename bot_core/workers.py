@@ -0,0 +1,176 @@
+"""
+Режим нескольких процессов.
+
+Супервизор получает обновления (polling или webhook) и раскладывает их по
+BOT_WORKERS процессам по chat_id, поэтому обновления одного чата всегда
+обрабатывает один и тот же процесс в порядке поступления. Кэши в памяти
+(bot_core/cache.py) при этом остаются согласованными: каждый чат живёт
+только в своём процессе.
+
+Настройки пула БД (DB_POOL_SIZE и др.) действуют в каждом процессе.
+"""
+import asyncio
+import logging
+import multiprocessing
+import signal
+from typing import Any, Callable, Dict, List, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+# Сколько ждать завершения процесса при остановке, секунд
+WORKER_STOP_TIMEOUT = 15
+
+_mp = multiprocessing.get_context("spawn")
+
+
+def update_chat_id(update: Update) -> int:
+    """chat_id обновления (или id пользователя, если чата нет)."""
+    event = update.event
+    chat = getattr(event, "chat", None) or getattr(getattr(event, "message", None), "chat", None)
+    if chat is not None:
+        return chat.id
+    user = getattr(event, "from_user", None)
+    return user.id if user is not None else 0
+
+
+def worker_main(index: int, queue) -> None:
+    """Точка входа процесса-обработчика."""
+    # Ctrl+C получает вся группа процессов, останавливает нас супервизор
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(level=logging.INFO, format=f"[worker {index}] %(levelname)s %(message)s")
+    asyncio.run(_worker(queue))
+
+
+async def _worker(queue) -> None:
+    from bot_core.bot import dp, on_startup
+    from bot_core.bot_instance import bot
+
+    await on_startup()
+    loop = asyncio.get_running_loop()
+    # Последняя задача каждого чата: следующая ждёт её завершения
+    tails: Dict[int, asyncio.Task] = {}
+
+    async def process(previous: Optional[asyncio.Task], update: Update) -> None:
+        if previous is not None:
+            await asyncio.gather(previous, return_exceptions=True)
+        try:
+            await dp.feed_update(bot, update)
+        except Exception:
+            logging.exception("Ошибка обработки обновления %s", update.update_id)
+
+    def forget(chat_id: int, task: asyncio.Task) -> None:
+        if tails.get(chat_id) is task:
+            del tails[chat_id]
+
+    while True:
+        raw = await loop.run_in_executor(None, queue.get)
+        if raw is None:
+            break
+        update = Update.model_validate(raw, context={"bot": bot})
+        chat_id = update_chat_id(update)
+        task = asyncio.create_task(process(tails.get(chat_id), update))
+        tails[chat_id] = task
+        task.add_done_callback(lambda done, chat_id=chat_id: forget(chat_id, done))
+
+    if tails:
+        await asyncio.wait(list(tails.values()), timeout=WORKER_STOP_TIMEOUT)
+    await bot.session.close()
+
+
+class Supervisor:
+    """Запускает процессы-обработчики, перезапускает упавшие и распределяет обновления."""
+
+    def __init__(self, workers: int):
+        self.queues = [_mp.Queue() for _ in range(workers)]
+        self.processes: List[Any] = [None] * workers
+        self._stopping = False
+
+    def _spawn(self, index: int) -> None:
+        process = _mp.Process(
+            target=worker_main, args=(index, self.queues[index]), name=f"bot-worker-{index}"
+        )
+        process.start()
+        self.processes[index] = process
+
+    def start(self) -> None:
+        for index in range(len(self.queues)):
+            self._spawn(index)
+
+    def dispatch(self, raw: Dict[str, Any]) -> None:
+        """Отправляет обновление процессу, отвечающему за его чат."""
+        update = Update.model_validate(raw)
+        self.queues[update_chat_id(update) % len(self.queues)].put(raw)
+
+    async def watch(self, interval: float = 1.0) -> None:
+        """Перезапускает упавшие процессы; очередь процесса при этом сохраняется."""
+        while not self._stopping:
+            for index, process in enumerate(self.processes):
+                if not process.is_alive():
+                    logging.warning(
+                        "Процесс %s завершился с кодом %s, перезапускаем",
+                        process.name, process.exitcode,
+                    )
+                    self._spawn(index)
+            await asyncio.sleep(interval)
+
+    async def stop(self) -> None:
+        """Плавная остановка: процессы дорабатывают очередь и выходят."""
+        self._stopping = True
+        for queue in self.queues:
+            queue.put(None)
+        loop = asyncio.get_running_loop()
+        for process in self.processes:
+            await loop.run_in_executor(None, process.join, WORKER_STOP_TIMEOUT)
+            if process.is_alive():
+                process.terminate()
+
+
+async def poll_updates(bot: Bot, allowed_updates: List[str], sink: Callable[[dict], None]) -> None:
+    """Цикл getUpdates, передающий каждое обновление в sink."""
+    await bot.delete_webhook()
+    offset = None
+    while True:
+        try:
+            updates = await bot.get_updates(
+                offset=offset, timeout=30, allowed_updates=allowed_updates
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logging.exception("Ошибка получения обновлений")
+            await asyncio.sleep(1)
+            continue
+        for update in updates:
+            offset = update.update_id + 1
+            sink(update.model_dump(mode="json", exclude_none=True))
+
+
+async def run_supervisor(dp: Dispatcher, bot: Bot, workers: int, mode: str) -> None:
+    from bot_core.webhook import run_status_server, run_webhook
+
+    supervisor = Supervisor(workers)
+    supervisor.start()
+    logging.info("Запущено процессов-обработчиков: %d", workers)
+
+    loop = asyncio.get_running_loop()
+    receiving = asyncio.create_task(
+        run_webhook(dp, bot, dispatch=supervisor.dispatch)
+        if mode == "webhook"
+        else poll_updates(bot, dp.resolve_used_update_types(), supervisor.dispatch)
+    )
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, receiving.cancel)
+
+    watching = asyncio.create_task(supervisor.watch())
+    status = asyncio.create_task(run_status_server()) if mode != "webhook" else None
+    try:
+        await receiving
+    except asyncio.CancelledError:
+        pass
+    finally:
+        watching.cancel()
+        if status is not None:
+            status.cancel()
+        await supervisor.stop()
+        await bot.session.close()
@@ -1,8 +1,13 @@
+import asyncio
 import os
+from time import perf_counter
+from typing import Callable, Optional
 
 from dotenv import load_dotenv
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 # Загружаем переменные окружения
 load_dotenv()
@@ -13,8 +18,52 @@ DB_URL: str = (
     f"@{os.getenv('DB_HOST', 'postgres')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
 )
 
+# Настройки пула соединений
+DB_ECHO: bool = os.getenv("DB_ECHO", "false").lower() == "true"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Соединения старше этого (в секундах) пересоздаются
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Кэши подготовленных выражений asyncpg и SQLAlchemy (0 — выключить,
+# нужно при работе через pgbouncer в режиме transaction)
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+DB_PREPARED_STATEMENT_CACHE_SIZE = int(os.getenv("DB_PREPARED_STATEMENT_CACHE_SIZE", "100"))
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Пул, измеряющий ожидание свободного соединения."""
+
+    # Получает время ожидания в секундах; задаётся снаружи (метрики бота).
+    # Атрибут класса переживает пересоздание пула при dispose()
+    wait_observer: Optional[Callable[[float], None]] = None
+
+    def _do_get(self):
+        observer = InstrumentedPool.wait_observer
+        if observer is None:
+            return super()._do_get()
+        started = perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            observer(perf_counter() - started)
+
+
 # Создаем асинхронный движок SQLAlchemy
-engine = create_async_engine(DB_URL, echo=True)
+engine = create_async_engine(
+    DB_URL,
+    echo=DB_ECHO,
+    poolclass=InstrumentedPool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=True,
+    connect_args={
+        "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": DB_PREPARED_STATEMENT_CACHE_SIZE,
+    },
+)
 
 # Создаем фабрику сессий
 AsyncSessionLocal = sessionmaker(
@@ -28,3 +77,26 @@ async def get_db():
         yield session
     finally:
         await session.close()  # Гарантированное закрытие соединения
+
+
+async def release_connection(session) -> None:
+    """
+    Завершает транзакцию сессии, чтобы соединение вернулось в пул на время
+    долгой работы без БД (отрисовка, отправка файла, рассылка).
+
+    Вызывает владелец транзакции — обработчик или задача, открывшая сессию;
+    следующий запрос сессии возьмёт соединение заново.
+    """
+    await session.commit()
+
+
+async def warm_pool(size: int = DB_POOL_SIZE) -> None:
+    """Заранее открывает соединения пула, чтобы первые обновления не ждали подключения."""
+    async def connect():
+        conn = await engine.connect()
+        await conn.execute(text("SELECT 1"))
+        return conn
+
+    connections = await asyncio.gather(*(connect() for _ in range(size)))
+    for conn in connections:
+        await conn.close()
@@ -0,0 +1,136 @@
+"""
+Разбор снов одним проходом (sweep line).
+
+Сны пользователя подаются в порядке start_time. Для каждого дня считаются
+минуты сна днём (DAY_START–DAY_END) и ночью: сон делится на границах суток и
+дневного интервала по местному времени, поэтому сон 21:00–07:00 попадает в
+оба дня. Заодно находятся промежутки бодрствования (в том числе через
+полночь) и пересечения снов — пересекающееся время учитывается один раз.
+"""
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+from typing import Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+# Границы дневного времени (по местному времени), остальное считается ночью
+DAY_START = time(6, 0)
+DAY_END = time(22, 0)
+
+Interval = Tuple[datetime, datetime]
+
+
+def as_zoneinfo(tz) -> tzinfo:
+    """ZoneInfo для имени или pytz-зоны: границы дней с ним считаются без localize()."""
+    if isinstance(tz, ZoneInfo):
+        return tz
+    return ZoneInfo(tz if isinstance(tz, str) else tz.zone)
+
+
+@dataclass
+class SleepSweep:
+    """
+    Итоги снов одного пользователя.
+
+    since/until ограничивают учитываемое время [since, until): части снов за
+    пределами периода в минуты не попадают, а в counts сон попадает, только
+    если закончился внутри периода.
+    """
+
+    tz: tzinfo
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    # день -> [секунды сна днём, секунды сна ночью]
+    seconds: Dict[date, List[float]] = field(default_factory=dict)
+    # день окончания -> число снов
+    counts: Dict[date, int] = field(default_factory=dict)
+    wakes: List[Interval] = field(default_factory=list)
+    overlaps: List[Interval] = field(default_factory=list)
+    _covered_until: Optional[datetime] = field(default=None, init=False, repr=False)
+    _last_start: Optional[datetime] = field(default=None, init=False, repr=False)
+    # Границы текущего дня: полночь, начало дня, конец дня, следующая полночь
+    _bounds_day: Optional[date] = field(default=None, init=False, repr=False)
+    _bounds: Tuple[datetime, ...] = field(default=(), init=False, repr=False)
+
+    def __post_init__(self):
+        self.tz = as_zoneinfo(self.tz)
+        if self.since is not None:
+            self.since = self.since.astimezone(timezone.utc)
+        if self.until is not None:
+            self.until = self.until.astimezone(timezone.utc)
+
+    def add(self, start: datetime, end: datetime) -> None:
+        """Учитывает очередной сон; start не меньше, чем у предыдущего."""
+        if self._last_start is not None and start < self._last_start:
+            raise ValueError("Сны должны идти в порядке start_time")
+        self._last_start = start
+
+        covered = self._covered_until
+        if covered is None or start >= covered:
+            if covered is not None and start > covered:
+                self.wakes.append((covered, start))
+            self._split(start, end)
+        else:
+            # Сон начался раньше, чем закончился предыдущий
+            self.overlaps.append((start, min(end, covered)))
+            if end > covered:
+                self._split(covered, end)
+        self._covered_until = end if covered is None else max(covered, end)
+
+        if self._within(end):
+            end_day = end.astimezone(self.tz).date()
+            self.counts[end_day] = self.counts.get(end_day, 0) + 1
+
+    def feed(self, sleeps: Iterable[Interval]) -> "SleepSweep":
+        for start, end in sleeps:
+            self.add(start, end)
+        return self
+
+    def minutes(self, day: date) -> Tuple[int, int]:
+        """Минуты сна днём и ночью за день."""
+        day_seconds, night_seconds = self.seconds.get(day, (0, 0))
+        return int(day_seconds // 60), int(night_seconds // 60)
+
+    def days(self) -> List[date]:
+        """Дни, в которые был сон или закончился хотя бы один сон."""
+        return sorted(self.seconds.keys() | self.counts.keys())
+
+    def _within(self, moment: datetime) -> bool:
+        return (self.since is None or moment >= self.since) and (
+            self.until is None or moment < self.until
+        )
+
+    def _day_bounds(self, day: date) -> Tuple[datetime, ...]:
+        if day != self._bounds_day:
+            self._bounds_day = day
+            # В UTC: разность моментов одной зоны не учитывает переход на летнее время
+            self._bounds = tuple(
+                datetime.combine(bound_day, bound, self.tz).astimezone(timezone.utc)
+                for bound_day, bound in (
+                    (day, time.min),
+                    (day, DAY_START),
+                    (day, DAY_END),
+                    (day + timedelta(days=1), time.min),
+                )
+            )
+        return self._bounds
+
+    def _split(self, start: datetime, end: datetime) -> None:
+        """Раскладывает [start, end) по дням и дневному/ночному времени."""
+        if self.since is not None:
+            start = max(start, self.since)
+        if self.until is not None:
+            end = min(end, self.until)
+        position = start
+        while position < end:
+            day = position.astimezone(self.tz).date()
+            midnight, day_start, day_end, next_midnight = self._day_bounds(day)
+            totals = self.seconds.setdefault(day, [0.0, 0.0])
+            for low, high, slot in (
+                (midnight, day_start, 1),
+                (day_start, day_end, 0),
+                (day_end, next_midnight, 1),
+            ):
+                low, high = max(position, low), min(end, high)
+                if high > low:
+                    totals[slot] += (high - low).total_seconds()
+            position = next_midnight
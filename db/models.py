@@ -1,12 +1,18 @@
 from datetime import datetime, timezone
 
-from sqlalchemy import (BigInteger, Column, DateTime, ForeignKey, Integer,
-                        String, func)
+import pytz
+from sqlalchemy import (BigInteger, Column, Date, DateTime, ForeignKey, Index,
+                        Integer, String, func)
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
 Base = declarative_base()
 
+# Часовой пояс пользователей по умолчанию (и незарегистрированных)
+DEFAULT_TIMEZONE = "Europe/Moscow"
+DEFAULT_TZ = pytz.timezone(DEFAULT_TIMEZONE)
+
 
 class User(Base):
     """Модель пользователя."""
@@ -16,6 +22,12 @@ class User(Base):
     # Используем chat_id вместо telegram_id
     chat_id = Column(BigInteger, unique=True, nullable=False)
     name = Column(String, nullable=False)
+    # Часовой пояс IANA: по нему считаются местные даты записей и итогов
+    timezone = Column(String, nullable=False, default=DEFAULT_TIMEZONE,
+                      server_default=DEFAULT_TIMEZONE)
+    # Растёт при каждом изменении записей: по ней экземпляры бота узнают,
+    # что закэшированные диаграммы устарели
+    data_version = Column(Integer, nullable=False, default=0, server_default="0")
 
 
 class SleepRecord(Base):
@@ -28,9 +40,23 @@ class SleepRecord(Base):
     start_time = Column(DateTime(timezone=True),
                         default=func.now(), nullable=False)
     end_time = Column(DateTime(timezone=True), nullable=True)
+    # Местная дата окончания сна; заполняется триггером в БД
+    local_day = Column(Date, nullable=True)
 
     user = relationship("User")
 
+    __table_args__ = (
+        Index("ix_sleep_records_chat_id_end_time", "chat_id", "end_time"),
+        Index("ix_sleep_records_chat_id_local_day", "chat_id", "local_day"),
+        # Частичный индекс для поиска активного (незавершённого) сна
+        Index(
+            "ix_sleep_records_active",
+            "chat_id",
+            "start_time",
+            postgresql_where=end_time.is_(None),
+        ),
+    )
+
     def __repr__(self) -> str:
         return f"<SleepRecord(id={self.id}, chat_id={self.chat_id}, start={self.start_time}, end={self.end_time})>"
 
@@ -45,5 +71,47 @@ class FeedingRecord(Base):
     amount = Column(Integer, nullable=False)
     timestamp = Column(DateTime(timezone=True),
                        default=lambda: datetime.now(timezone.utc))
+    # Местная дата кормления; заполняется триггером в БД
+    local_day = Column(Date, nullable=True)
 
     user = relationship("User")
+
+    __table_args__ = (
+        Index("ix_feeding_records_chat_id_timestamp", "chat_id", "timestamp"),
+        Index("ix_feeding_records_chat_id_local_day", "chat_id", "local_day"),
+    )
+
+
+class DailyRollup(Base):
+    """Суточные итоги питания и сна (по местной дате)."""
+    __tablename__ = "daily_rollups"
+
+    chat_id = Column(BigInteger, ForeignKey("users.chat_id"), primary_key=True)
+    local_date = Column(Date, primary_key=True)
+    day_feed_ml = Column(Integer, nullable=False, default=0, server_default="0")
+    night_feed_ml = Column(Integer, nullable=False, default=0, server_default="0")
+    day_sleep_min = Column(Integer, nullable=False, default=0, server_default="0")
+    night_sleep_min = Column(Integer, nullable=False, default=0, server_default="0")
+    feed_count = Column(Integer, nullable=False, default=0, server_default="0")
+    sleep_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+    def __repr__(self) -> str:
+        return f"<DailyRollup(chat_id={self.chat_id}, date={self.local_date})>"
+
+
+class BotState(Base):
+    """Состояние FSM и временные данные диалога (общие для всех экземпляров бота)."""
+    __tablename__ = "bot_state"
+
+    bot_id = Column(BigInteger, primary_key=True)
+    chat_id = Column(BigInteger, primary_key=True)
+    user_id = Column(BigInteger, primary_key=True)
+    # default — FSM, другие значения — отдельные хранилища (например, plot)
+    destiny = Column(String(32), primary_key=True)
+    state = Column(String, nullable=True)
+    data = Column(JSONB(none_as_null=True), nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index("ix_bot_state_expires_at", "expires_at"),
+    )
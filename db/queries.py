@@ -0,0 +1,62 @@
+from datetime import datetime
+
+from sqlalchemy import update
+from sqlalchemy.future import select
+
+from db.models import SleepRecord, User
+
+
+def user_query(chat_id: int):
+    """Пользователь по chat_id."""
+    return select(User).where(User.chat_id == chat_id)
+
+
+def data_version_query(chat_id: int):
+    """Версия данных пользователя."""
+    return select(User.data_version).where(User.chat_id == chat_id)
+
+
+def bump_data_version_query(chat_id: int):
+    """Увеличивает версию данных пользователя (в транзакции записи)."""
+    return (
+        update(User)
+        .where(User.chat_id == chat_id)
+        .values(data_version=User.data_version + 1)
+    )
+
+
+def active_sleep_query(chat_id: int):
+    """Последний незавершённый сон пользователя."""
+    return (
+        select(SleepRecord)
+        .where(SleepRecord.chat_id == chat_id, SleepRecord.end_time.is_(None))
+        .order_by(SleepRecord.start_time.desc())
+    )
+
+
+def open_sleeps_query():
+    """Все незавершённые сны (для восстановления индекса при старте)."""
+    return (
+        select(SleepRecord.chat_id, SleepRecord.id, SleepRecord.start_time)
+        .where(SleepRecord.end_time.is_(None))
+        .order_by(SleepRecord.chat_id, SleepRecord.start_time)
+    )
+
+
+def end_sleep_query(sleep_id: int, end_time: datetime):
+    """
+    Завершает сон без предварительной загрузки записи.
+
+    Уже завершённый сон не меняется: rowcount == 0 значит, что его успели
+    завершить (повторное нажатие или другой экземпляр бота).
+    """
+    return (
+        update(SleepRecord)
+        .where(SleepRecord.id == sleep_id, SleepRecord.end_time.is_(None))
+        .values(end_time=end_time)
+    )
+
+
+def set_timezone_query(chat_id: int, timezone: str):
+    """Меняет часовой пояс пользователя; local_day записей пересчитывает триггер."""
+    return update(User).where(User.chat_id == chat_id).values(timezone=timezone)
@@ -0,0 +1,204 @@
+"""
+Суточные итоги (daily_rollups).
+
+Обработчики записи обновляют итоги в той же транзакции, что и сами записи,
+поэтому графики и статистика читают по одной строке на день вместо сырых
+записей. Даты считаются в часовом поясе пользователя (users.timezone) и
+совпадают с local_day записей. Сон делится между днями и дневным/ночным
+временем (db/intervals.py), sleep_count — число снов, закончившихся в этот
+день. Полный пересчёт:
+python -m db.rollups rebuild [chat_id ...]
+"""
+import argparse
+import asyncio
+import logging
+import os
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Time, case, cast, delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.future import select
+
+from db.database import get_db
+from db.intervals import DAY_END, DAY_START, SleepSweep, as_zoneinfo
+from db.models import DEFAULT_TZ, DailyRollup, FeedingRecord, SleepRecord, User
+
+# Сколько строк итогов сна записывается одним INSERT при пересчёте
+REBUILD_CHUNK = int(os.getenv("REBUILD_CHUNK", "1000"))
+
+
+def day_bucket(moment: datetime, tz=DEFAULT_TZ) -> Tuple[date, bool]:
+    """Местная дата момента и признак дневного времени в часовом поясе tz."""
+    local = moment.astimezone(tz)
+    return local.date(), DAY_START <= local.time() <= DAY_END
+
+
+def _upsert(chat_id: int, local_date: date, **increments):
+    """INSERT ... ON CONFLICT, прибавляющий значения к существующей строке."""
+    stmt = insert(DailyRollup).values(chat_id=chat_id, local_date=local_date, **increments)
+    return stmt.on_conflict_do_update(
+        index_elements=[DailyRollup.chat_id, DailyRollup.local_date],
+        set_={
+            name: getattr(DailyRollup, name) + getattr(stmt.excluded, name)
+            for name in increments
+        },
+    )
+
+
+async def add_feeding(session, chat_id: int, timestamp: datetime, amount: int, tz=DEFAULT_TZ) -> None:
+    """Учитывает новое кормление. Коммит остаётся за вызывающим кодом."""
+    local_date, is_day = day_bucket(timestamp, tz)
+    column = "day_feed_ml" if is_day else "night_feed_ml"
+    await session.execute(_upsert(chat_id, local_date, **{column: amount, "feed_count": 1}))
+
+
+def _sleep_rows(chat_id: int, sweep: SleepSweep, days: Sequence[date]) -> List[Dict]:
+    rows = []
+    for day in days:
+        day_sleep_min, night_sleep_min = sweep.minutes(day)
+        rows.append({
+            "chat_id": chat_id,
+            "local_date": day,
+            "day_sleep_min": day_sleep_min,
+            "night_sleep_min": night_sleep_min,
+            "sleep_count": sweep.counts.get(day, 0),
+        })
+    return rows
+
+
+def _replace_sleep(rows: List[Dict]):
+    """INSERT ... ON CONFLICT, заменяющий итоги сна в существующих строках."""
+    stmt = insert(DailyRollup).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[DailyRollup.chat_id, DailyRollup.local_date],
+        set_={
+            name: getattr(stmt.excluded, name)
+            for name in ("day_sleep_min", "night_sleep_min", "sleep_count")
+        },
+    )
+
+
+def overlapping_sleeps_query(chat_id: int, since: datetime, until: datetime):
+    """Завершённые сны пользователя, задевающие [since, until), в порядке начала."""
+    return (
+        select(SleepRecord.start_time, SleepRecord.end_time)
+        .where(
+            SleepRecord.chat_id == chat_id,
+            SleepRecord.end_time >= since,
+            SleepRecord.start_time < until,
+        )
+        .order_by(SleepRecord.start_time)
+    )
+
+
+async def add_sleep(session, chat_id: int, start_time: datetime, end_time: datetime, tz=DEFAULT_TZ) -> None:
+    """
+    Учитывает завершённый сон, уже записанный в sleep_records.
+
+    Итоги сна всех дней, которых он касается, пересчитываются по снам этих
+    дней — пересечения с другими снами учитываются так же, как в rebuild().
+    """
+    zone = as_zoneinfo(tz)
+    first_day = start_time.astimezone(zone).date()
+    last_day = end_time.astimezone(zone).date()
+    since = datetime.combine(first_day, time.min, zone)
+    until = datetime.combine(last_day + timedelta(days=1), time.min, zone)
+
+    result = await session.execute(overlapping_sleeps_query(chat_id, since, until))
+    sweep = SleepSweep(zone, since, until).feed(result.all())
+    days = [first_day + timedelta(days=i) for i in range((last_day - first_day).days + 1)]
+    await session.execute(_replace_sleep(_sleep_rows(chat_id, sweep, days)))
+
+
+def rollups_query(chat_id: int, start_date: date, end_date: date, *columns):
+    """
+    Суточные итоги пользователя за период включительно.
+
+    Если переданы columns, выбираются только дата и эти выражения.
+    """
+    query = select(DailyRollup.local_date, *columns) if columns else select(DailyRollup)
+    return query.where(
+        DailyRollup.chat_id == chat_id,
+        DailyRollup.local_date.between(start_date, end_date),
+    ).order_by(DailyRollup.local_date)
+
+
+def _feeding_totals(chat_ids: Optional[Sequence[int]]):
+    local = func.timezone(User.timezone, FeedingRecord.timestamp)
+    is_day = cast(local, Time).between(DAY_START, DAY_END)
+    query = (
+        select(
+            FeedingRecord.chat_id,
+            FeedingRecord.local_day.label("local_date"),
+            func.sum(case((is_day, FeedingRecord.amount), else_=0)).label("day_feed_ml"),
+            func.sum(case((is_day, 0), else_=FeedingRecord.amount)).label("night_feed_ml"),
+            func.count().label("feed_count"),
+        )
+        .join(User, User.chat_id == FeedingRecord.chat_id)
+        .where(FeedingRecord.timestamp.isnot(None))
+        .group_by(FeedingRecord.chat_id, FeedingRecord.local_day)
+    )
+    if chat_ids:
+        query = query.where(FeedingRecord.chat_id.in_(chat_ids))
+    return query
+
+
+def _sleeps_by_chat(chat_ids: Optional[Sequence[int]]):
+    """Завершённые сны с часовым поясом пользователя, по чатам в порядке начала."""
+    query = (
+        select(SleepRecord.chat_id, User.timezone, SleepRecord.start_time, SleepRecord.end_time)
+        .join(User, User.chat_id == SleepRecord.chat_id)
+        .where(SleepRecord.end_time.isnot(None))
+        .order_by(SleepRecord.chat_id, SleepRecord.start_time)
+    )
+    if chat_ids:
+        query = query.where(SleepRecord.chat_id.in_(chat_ids))
+    return query
+
+
+async def rebuild(session, chat_ids: Optional[Sequence[int]] = None) -> None:
+    """Пересчитывает итоги из сырых записей (всех или указанных пользователей)."""
+    cleanup = delete(DailyRollup)
+    if chat_ids:
+        cleanup = cleanup.where(DailyRollup.chat_id.in_(chat_ids))
+    await session.execute(cleanup)
+
+    totals = _feeding_totals(chat_ids)
+    columns = [column.name for column in totals.selected_columns]
+    await session.execute(insert(DailyRollup).from_select(columns, totals))
+
+    # Сон раскладывается по дням одним проходом по снам каждого пользователя
+    rows: List[Dict] = []
+    chat_id, sweep = None, None
+    result = await session.stream(
+        _sleeps_by_chat(chat_ids).execution_options(yield_per=REBUILD_CHUNK)
+    )
+    async for row_chat_id, zone, start_time, end_time in result:
+        if row_chat_id != chat_id:
+            if sweep is not None:
+                rows.extend(_sleep_rows(chat_id, sweep, sweep.days()))
+            chat_id, sweep = row_chat_id, SleepSweep(zone)
+        sweep.add(start_time, end_time)
+    if sweep is not None:
+        rows.extend(_sleep_rows(chat_id, sweep, sweep.days()))
+
+    for offset in range(0, len(rows), REBUILD_CHUNK):
+        await session.execute(_replace_sleep(rows[offset:offset + REBUILD_CHUNK]))
+
+
+async def main(chat_ids: Sequence[int]) -> None:
+    async for db in get_db():
+        await rebuild(db, chat_ids)
+        await db.commit()
+    logging.info("Суточные итоги пересчитаны: %s", ", ".join(map(str, chat_ids)) or "все пользователи")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Суточные итоги питания и сна")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("chat_ids", nargs="*", type=int, help="по умолчанию — все пользователи")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(args.chat_ids))
@@ -0,0 +1,36 @@
+from datetime import date
+
+import numpy as np
+
+from bot_core.aggregate import daily_table, daily_totals, day_range, to_columns
+
+
+def test_day_range():
+    period = day_range(date(2026, 10, 30), 3)
+    assert period.tolist() == [date(2026, 10, 30), date(2026, 10, 31), date(2026, 11, 1)]
+
+
+def test_daily_totals_sums_unsorted_duplicates_and_drops_outside():
+    period = day_range(date(2026, 10, 1), 3)
+    days, values = to_columns([
+        (date(2026, 10, 3), 10),
+        (date(2026, 10, 1), 5),
+        (date(2026, 10, 3), 1),
+        (date(2026, 9, 30), 100),
+        (date(2026, 10, 4), 100),
+    ])
+
+    assert daily_totals(days, values, period).tolist() == [5, 0, 11]
+
+
+def test_daily_totals_without_rows_is_zeros():
+    period = day_range(date(2026, 10, 1), 2)
+    assert daily_totals(*to_columns([]), period).tolist() == [0, 0]
+
+
+def test_daily_table_splits_columns():
+    period = day_range(date(2026, 10, 1), 2)
+    table = daily_table([(date(2026, 10, 2), 1, 2), (date(2026, 10, 5), 7, 7)], period, 2)
+
+    assert np.array_equal(table, [[0, 1], [0, 2]])
+    assert daily_table([], period, 3).shape == (3, 2)
@@ -0,0 +1,69 @@
+import asyncio
+from datetime import date
+
+from bot_core.cache import PlotCache
+
+TODAY = date(2026, 10, 17)
+
+
+def key(cache: PlotCache, chat_id: int, plot_type: str = "feeding", period: str = "7d"):
+    # Без shared версия данных берётся из памяти, БД не нужна
+    return asyncio.run(cache.key(None, chat_id, plot_type, period, TODAY))
+
+
+def test_evicts_least_recently_used_by_entries():
+    cache = PlotCache(max_bytes=1000, max_entries=2, shared=False)
+    first, second, third = (key(cache, 1, period=period) for period in ("7d", "30d", "all"))
+    cache.put(first, b"1")
+    cache.put(second, b"2")
+    cache.get(first)
+    cache.put(third, b"3")
+
+    assert cache.get(second) is None
+    assert cache.get(first).png == b"1"
+    assert cache.get(third).png == b"3"
+
+
+def test_evicts_by_bytes():
+    cache = PlotCache(max_bytes=10, max_entries=100, shared=False)
+    first, second = key(cache, 1), key(cache, 2)
+    cache.put(first, b"x" * 6)
+    cache.put(second, b"y" * 6)
+
+    assert cache.get(first) is None
+    assert cache.get(second).size == 6
+
+
+def test_bump_invalidates_only_that_chat():
+    cache = PlotCache(shared=False)
+    old, other = key(cache, 1), key(cache, 2)
+    cache.put(old, b"old")
+    cache.put(other, b"other")
+
+    asyncio.run(cache.bump(None, 1))
+
+    new = key(cache, 1)
+    assert new != old
+    assert cache.get(old) is None
+    assert cache.get(new) is None
+    assert cache.get(other).png == b"other"
+
+
+def test_set_file_id_drops_png_and_frees_bytes():
+    cache = PlotCache(max_bytes=10, max_entries=100, shared=False)
+    first, second = key(cache, 1), key(cache, 2)
+    cache.put(first, b"x" * 8)
+    cache.set_file_id(first, "file-1")
+    # Место освобождено: вторая картинка не вытесняет первую запись
+    cache.put(second, b"y" * 8)
+
+    entry = cache.get(first)
+    assert entry.png is None
+    assert entry.file_id == "file-1"
+    assert cache.get(second).png == b"y" * 8
+
+
+def test_set_file_id_for_evicted_key_is_ignored():
+    cache = PlotCache(shared=False)
+    cache.set_file_id(key(cache, 1), "file-1")
+    assert cache.get(key(cache, 1)) is None
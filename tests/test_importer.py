@@ -0,0 +1,71 @@
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from bot_core.importer import IMPORT_MAX_ERRORS, ImportFailed, parse_history
+
+MOSCOW = ZoneInfo("Europe/Moscow")
+
+
+def csv(*lines: str) -> bytes:
+    return "\n".join(("kind,start_time,end_time,amount_ml",) + lines).encode()
+
+
+def test_parses_feedings_and_sleeps_in_utc():
+    history = parse_history(csv(
+        "feeding,2026-10-01T09:00:00,,120",
+        "sleep,2026-10-01T10:00:00+03:00,2026-10-01T11:30:00+03:00,",
+    ), MOSCOW)
+
+    assert history.feedings == [(datetime(2026, 10, 1, 6, tzinfo=timezone.utc), 120)]
+    assert history.sleeps == [(
+        datetime(2026, 10, 1, 7, tzinfo=timezone.utc),
+        datetime(2026, 10, 1, 8, 30, tzinfo=timezone.utc),
+    )]
+    assert history.total == 2
+
+
+def test_naive_time_uses_given_zone():
+    history = parse_history(csv("feeding,2026-10-01T09:00:00,,50"), ZoneInfo("Asia/Almaty"))
+    assert history.feedings[0][0] == datetime(2026, 10, 1, 4, tzinfo=timezone.utc)
+
+
+def test_open_sleep_is_counted_not_imported():
+    history = parse_history(csv(
+        "sleep,2026-10-01T10:00:00,2026-10-01T11:00:00,",
+        "sleep,2026-10-01T21:00:00,,",
+    ), MOSCOW)
+
+    assert len(history.sleeps) == 1
+    assert history.open_sleeps == 1
+
+
+def test_bom_is_accepted():
+    assert parse_history(b"\xef\xbb\xbf" + csv("feeding,2026-10-01T09:00:00,,50")).total == 1
+
+
+@pytest.mark.parametrize("line, message", [
+    ("feeding,2026-10-01T09:00:00,,0", "объём"),
+    ("feeding,2026-10-01T09:00:00,,abc", "Строка 2"),
+    ("sleep,2026-10-01T11:00:00,2026-10-01T10:00:00,", "конец сна раньше начала"),
+    ("walk,2026-10-01T11:00:00,,", "неизвестный тип"),
+    ("feeding,вчера,,50", "Строка 2"),
+])
+def test_invalid_rows_are_reported(line, message):
+    with pytest.raises(ImportFailed) as failed:
+        parse_history(csv(line))
+    assert message in failed.value.errors[0]
+
+
+def test_errors_are_capped():
+    with pytest.raises(ImportFailed) as failed:
+        parse_history(csv(*["feeding,2026-10-01T09:00:00,,0"] * (IMPORT_MAX_ERRORS + 3)))
+    assert len(failed.value.errors) == IMPORT_MAX_ERRORS
+
+
+def test_missing_columns_and_encoding():
+    with pytest.raises(ImportFailed, match="Нет колонок: kind"):
+        parse_history(b"start_time\n2026-10-01T09:00:00\n")
+    with pytest.raises(ImportFailed, match="UTF-8"):
+        parse_history("kind,start_time\n".encode("cp1251") + "сон".encode("cp1251"))
@@ -0,0 +1,85 @@
+from datetime import date, datetime, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from db.intervals import SleepSweep
+
+MOSCOW = ZoneInfo("Europe/Moscow")
+BERLIN = ZoneInfo("Europe/Berlin")
+
+
+def at(zone, *args) -> datetime:
+    return datetime(*args, tzinfo=zone).astimezone(timezone.utc)
+
+
+def test_sleep_across_midnight_is_split_by_day_and_night():
+    sweep = SleepSweep(MOSCOW).feed([(at(MOSCOW, 2026, 10, 1, 21), at(MOSCOW, 2026, 10, 2, 7))])
+
+    assert sweep.minutes(date(2026, 10, 1)) == (60, 120)
+    assert sweep.minutes(date(2026, 10, 2)) == (60, 360)
+    # Сон считается в день окончания
+    assert sweep.counts == {date(2026, 10, 2): 1}
+
+
+def test_overlap_is_reported_and_counted_once():
+    sweep = SleepSweep(MOSCOW).feed([
+        (at(MOSCOW, 2026, 10, 2, 13), at(MOSCOW, 2026, 10, 2, 15)),
+        (at(MOSCOW, 2026, 10, 2, 14), at(MOSCOW, 2026, 10, 2, 16)),
+        # Целиком внутри уже учтённого времени
+        (at(MOSCOW, 2026, 10, 2, 14, 30), at(MOSCOW, 2026, 10, 2, 15, 30)),
+    ])
+
+    assert sweep.minutes(date(2026, 10, 2)) == (180, 0)
+    assert sweep.overlaps == [
+        (at(MOSCOW, 2026, 10, 2, 14), at(MOSCOW, 2026, 10, 2, 15)),
+        (at(MOSCOW, 2026, 10, 2, 14, 30), at(MOSCOW, 2026, 10, 2, 15, 30)),
+    ]
+    assert sweep.wakes == []
+    assert sweep.counts == {date(2026, 10, 2): 3}
+
+
+def test_wake_window_across_midnight():
+    sweep = SleepSweep(MOSCOW).feed([
+        (at(MOSCOW, 2026, 10, 1, 20), at(MOSCOW, 2026, 10, 1, 23, 30)),
+        (at(MOSCOW, 2026, 10, 2, 0, 30), at(MOSCOW, 2026, 10, 2, 6)),
+    ])
+
+    assert sweep.wakes == [(at(MOSCOW, 2026, 10, 1, 23, 30), at(MOSCOW, 2026, 10, 2, 0, 30))]
+
+
+@pytest.mark.parametrize(
+    "day, night_minutes",
+    [
+        # Переход на зимнее время: в ночи 25.10 на час больше
+        (date(2026, 10, 25), 7 * 60),
+        # Переход на летнее время: в ночи 29.03 на час меньше
+        (date(2026, 3, 29), 5 * 60),
+    ],
+)
+def test_dst_changes_length_of_night(day, night_minutes):
+    start = datetime.combine(day, datetime.min.time(), BERLIN).astimezone(timezone.utc)
+    end = at(BERLIN, day.year, day.month, day.day, 6)
+    sweep = SleepSweep(BERLIN).feed([(start, end)])
+
+    assert sweep.minutes(day) == (0, night_minutes)
+
+
+def test_since_until_clip_minutes_and_counts():
+    sweep = SleepSweep(
+        MOSCOW, since=at(MOSCOW, 2026, 10, 2, 0), until=at(MOSCOW, 2026, 10, 3, 0)
+    ).feed([
+        (at(MOSCOW, 2026, 10, 1, 21), at(MOSCOW, 2026, 10, 2, 7)),
+        (at(MOSCOW, 2026, 10, 2, 23), at(MOSCOW, 2026, 10, 3, 1)),
+    ])
+
+    assert sweep.days() == [date(2026, 10, 2)]
+    assert sweep.minutes(date(2026, 10, 2)) == (60, 420)
+    assert sweep.counts == {date(2026, 10, 2): 1}
+
+
+def test_unsorted_sleeps_are_rejected():
+    sweep = SleepSweep(MOSCOW)
+    sweep.add(at(MOSCOW, 2026, 10, 2, 13), at(MOSCOW, 2026, 10, 2, 14))
+    with pytest.raises(ValueError):
+        sweep.add(at(MOSCOW, 2026, 10, 2, 12), at(MOSCOW, 2026, 10, 2, 13))
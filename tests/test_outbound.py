@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from bot_core import outbound
+from bot_core.outbound import (BULK, INTERACTIVE, OutboundLimiter,
+                               PriorityBucket, TokenBucket, bulk_priority)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(outbound, "monotonic", clock)
+    return clock
+
+
+def test_reserve_spends_burst_then_borrows(clock):
+    bucket = TokenBucket(rate=2, capacity=2)
+
+    assert [bucket.reserve() for _ in range(4)] == [0.0, 0.0, 0.5, 1.0]
+    clock.now += 1.0
+    # Долг погашен, запаса ещё нет
+    assert bucket.reserve() == 0.5
+
+
+def test_refill_is_capped_by_capacity(clock):
+    bucket = TokenBucket(rate=1, capacity=3)
+    for _ in range(3):
+        bucket.reserve()
+    clock.now += 100
+    assert bucket.idle(clock.now)
+    assert [bucket.reserve() for _ in range(4)] == [0.0, 0.0, 0.0, 1.0]
+
+
+def test_pause_delays_even_with_tokens(clock):
+    bucket = TokenBucket(rate=1, capacity=3)
+    bucket.pause(5)
+    assert bucket.reserve() == 5
+    assert not bucket.idle(clock.now)
+    clock.now += 5
+    assert bucket.reserve() == 0.0
+
+
+async def _served(bucket: PriorityBucket, requests, cancel=()):
+    served = []
+
+    async def acquire(name, priority):
+        await bucket.acquire(priority)
+        served.append(name)
+
+    tasks = {name: asyncio.create_task(acquire(name, priority)) for name, priority in requests}
+    # Все ожидания встают в очередь до первой выдачи токена
+    await asyncio.sleep(0)
+    for name in cancel:
+        tasks[name].cancel()
+    await asyncio.gather(*tasks.values(), return_exceptions=True)
+    return served
+
+
+def test_priority_bucket_serves_interactive_first(clock):
+    bucket = PriorityBucket(rate=1000)
+    served = asyncio.run(_served(bucket, [
+        ("bulk-1", BULK), ("bulk-2", BULK), ("reply", INTERACTIVE), ("bulk-3", BULK),
+    ]))
+    assert served == ["reply", "bulk-1", "bulk-2", "bulk-3"]
+
+
+def test_cancelled_waiter_does_not_take_a_token(clock):
+    bucket = PriorityBucket(rate=1000)
+    served = asyncio.run(_served(
+        bucket, [("bulk-1", BULK), ("reply", INTERACTIVE), ("bulk-2", BULK)], cancel=["reply"]
+    ))
+    assert served == ["bulk-1", "bulk-2"]
+    # Часы стоят: из запаса в один токен выдано ровно два, отменённому — ничего
+    assert bucket.bucket.tokens == -1
+
+
+def _flood(retry_after: int):
+    async def make_request(bot, method):
+        raise TelegramRetryAfter(method=method, message="Flood control", retry_after=retry_after)
+    return make_request
+
+
+def test_bulk_retry_after_pauses_whole_bot():
+    limiter = OutboundLimiter(global_rate=1000, max_retries=0)
+
+    async def send():
+        with bulk_priority():
+            await limiter(_flood(30), None, SendMessage(chat_id=1, text="stats"))
+
+    with pytest.raises(TelegramRetryAfter):
+        asyncio.run(send())
+    now = outbound.monotonic()
+    assert limiter.chats[1].paused_until > now + 25
+    assert limiter.global_bucket.bucket.paused_until > now + 25
+
+
+def test_interactive_retry_after_pauses_only_chat():
+    limiter = OutboundLimiter(global_rate=1000, max_retries=0)
+
+    with pytest.raises(TelegramRetryAfter):
+        asyncio.run(limiter(_flood(30), None, SendMessage(chat_id=1, text="reply")))
+    assert limiter.chats[1].paused_until > outbound.monotonic() + 25
+    assert limiter.global_bucket.bucket.paused_until == 0.0
@@ -0,0 +1,152 @@
+"""
+Планы горячих запросов на PostgreSQL.
+
+Нужна база со схемой после alembic upgrade head, адрес — в TEST_DATABASE_URL
+(postgresql+asyncpg://...); без него тесты пропускаются. В транзакции
+засеиваются тысячи синтетических пользователей с историей, выполняется
+ANALYZE, и каждый запрос должен обойтись без последовательного скана. Все
+изменения откатываются.
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="TEST_DATABASE_URL не задан")
+
+# Синтетические chat_id: ниже диапазонов бенчмарков
+CHAT_BASE = -900_000_000
+CHAT_ID = CHAT_BASE
+OTHER_CHATS = 2000
+ROWS_PER_CHAT = 50
+
+SEED = [
+    f"""
+    INSERT INTO users (chat_id, name)
+    SELECT {CHAT_BASE} - g, 'plans' FROM generate_series(0, {OTHER_CHATS}) AS g
+    """,
+    f"""
+    INSERT INTO feeding_records (chat_id, amount, timestamp)
+    SELECT {CHAT_BASE} - c, 100, now() - make_interval(hours => 3 * i)
+    FROM generate_series(0, {OTHER_CHATS}) AS c, generate_series(1, {ROWS_PER_CHAT}) AS i
+    """,
+    f"""
+    INSERT INTO sleep_records (chat_id, start_time, end_time)
+    SELECT {CHAT_BASE} - c,
+           now() - make_interval(hours => 3 * i + 1),
+           now() - make_interval(hours => 3 * i)
+    FROM generate_series(0, {OTHER_CHATS}) AS c, generate_series(1, {ROWS_PER_CHAT}) AS i
+    """,
+    # Незавершённый сон у каждого десятого
+    f"""
+    INSERT INTO sleep_records (chat_id, start_time)
+    SELECT {CHAT_BASE} - c, now() FROM generate_series(0, {OTHER_CHATS}, 10) AS c
+    """,
+    f"""
+    INSERT INTO daily_rollups (chat_id, local_date, day_feed_ml, feed_count)
+    SELECT {CHAT_BASE} - c, current_date - i, 600, 6
+    FROM generate_series(0, {OTHER_CHATS}) AS c, generate_series(1, {ROWS_PER_CHAT}) AS i
+    """,
+    "ANALYZE users, feeding_records, sleep_records, daily_rollups",
+]
+
+
+def hot_queries(chat_id: int) -> dict:
+    """Запросы, которые должны обслуживаться индексами."""
+    from sqlalchemy import text
+
+    from bot_core.statistics import _statistics_query
+    from db.models import DEFAULT_TZ, DailyRollup
+    from db.queries import (active_sleep_query, bump_data_version_query,
+                            data_version_query, end_sleep_query,
+                            open_sleeps_query, set_timezone_query, user_query)
+    from db.rollups import (_feeding_totals, _sleeps_by_chat,
+                            overlapping_sleeps_query, rollups_query)
+
+    today = datetime.now(DEFAULT_TZ).date()
+    now = datetime.now(timezone.utc)
+    return {
+        "statistics.build_statistics_text": _statistics_query(
+            [chat_id], today - timedelta(days=2), today
+        ),
+        "plots.fetch_plot_data": rollups_query(
+            chat_id,
+            today - timedelta(days=89),
+            today - timedelta(days=1),
+            DailyRollup.day_feed_ml + DailyRollup.night_feed_ml,
+        ),
+        "rollups.add_sleep": overlapping_sleeps_query(
+            chat_id, now - timedelta(days=1), now + timedelta(days=1)
+        ),
+        "rollups.rebuild[feeding]": _feeding_totals([chat_id]),
+        "rollups.rebuild[sleep]": _sleeps_by_chat([chat_id]),
+        "handlers.user": user_query(chat_id),
+        "handlers.active_sleep": active_sleep_query(chat_id),
+        "handlers.end_sleep": end_sleep_query(1, now),
+        "cache.data_version": data_version_query(chat_id),
+        "cache.bump_data_version": bump_data_version_query(chat_id),
+        "handlers.set_timezone": set_timezone_query(chat_id, "Asia/Almaty"),
+        # Запросы триггера users_timezone_changed (в плане UPDATE users их не видно)
+        "trigger.feeding_local_day": text(
+            "UPDATE feeding_records SET local_day = (timestamp AT TIME ZONE 'Asia/Almaty')::date"
+            " WHERE chat_id = :chat_id"
+        ).bindparams(chat_id=chat_id),
+        "trigger.sleep_local_day": text(
+            "UPDATE sleep_records SET local_day = (end_time AT TIME ZONE 'Asia/Almaty')::date"
+            " WHERE chat_id = :chat_id"
+        ).bindparams(chat_id=chat_id),
+        "startup.active_sleeps": open_sleeps_query(),
+    }
+
+
+def seq_scans(plan: dict) -> list:
+    """Таблицы, которые план читает последовательным сканом."""
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+async def explain(conn, stmt) -> dict:
+    compiled = stmt.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    params = compiled.construct_params()
+    args = tuple(params[name] for name in compiled.positiontup)
+    result = await conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + compiled.string, args)
+    return result.scalar()[0]["Plan"]
+
+
+async def collect_plans() -> dict:
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import NullPool
+
+    engine = create_async_engine(DATABASE_URL, poolclass=NullPool)
+    try:
+        async with engine.connect() as conn:
+            transaction = await conn.begin()
+            try:
+                for statement in SEED:
+                    await conn.execute(text(statement))
+                return {
+                    name: await explain(conn, stmt)
+                    for name, stmt in hot_queries(CHAT_ID).items()
+                }
+            finally:
+                await transaction.rollback()
+    finally:
+        await engine.dispose()
+
+
+@pytest.fixture(scope="module")
+def plans() -> dict:
+    return asyncio.run(collect_plans())
+
+
+def test_hot_queries_use_indexes(plans):
+    failed = {name: tables for name, plan in plans.items() if (tables := seq_scans(plan))}
+    assert not failed, f"Seq Scan: {failed}"